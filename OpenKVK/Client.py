@@ -1,16 +1,289 @@
 import math
-try:
-    from urllib2 import urlopen
-except ImportError:
-    from urllib.request import urlopen
-
 try:
     from urllib import quote
 except:
     from urllib.parse import quote
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 import ast
+import atexit
+import csv
+import io
+import itertools
 import json
+import multiprocessing
 import re
+import sys
+import threading
+import time
+import warnings
+
+from .instrument import QueryStats
+from .resilience import RetryPolicy
+from .result import ColumnSet, ResultSet, _convert, record_type
+from .stream import iter_result
+from .transport import ConnectionPool, SingleFlight
+
+
+def _map_ordered(func, items, workers=1):
+    """Apply *func* to every item in *items* using up to *workers* threads
+
+    Results are returned in the order of *items*. When one of the calls raises, no new
+    items are started and the first exception is re-raised once the running calls finish.
+
+    :param callable func: Function to apply
+    :param list items: Items to apply *func* to
+    :param int workers: Maximum number of concurrent calls
+    :returns: List of results
+    :rtype: list
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    errors = []
+    lock = threading.Lock()
+    pending = iter(range(len(items)))
+
+    def worker():
+        while True:
+            with lock:
+                if errors:
+                    return
+                try:
+                    index = next(pending)
+                except StopIteration:
+                    return
+            try:
+                results[index] = func(items[index])
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                return
+
+    threads = [threading.Thread(target=worker) for i in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+_DONE = object()
+
+
+def _interleave(iterables, workers=1):
+    """Yield the items of every iterable in *iterables*, consuming up to *workers* of them concurrently on threads
+
+    Items are yielded as they are produced, the items of different iterables are interleaved. When one of the
+    iterables raises, no new iterables are started and the exception is re-raised. Closing the generator stops
+    the running iterables after their current item.
+
+    :param list iterables: Iterables to consume, for instance generators that request pages
+    :param int workers: Maximum number of iterables consumed concurrently
+    :returns: Iterator of items
+    """
+    iterables = list(iterables)
+    if workers <= 1 or len(iterables) <= 1:
+        for iterable in iterables:
+            for item in iterable:
+                yield item
+        return
+
+    items = queue.Queue(maxsize=workers)
+    stop = threading.Event()
+    errors = []
+    lock = threading.Lock()
+    pending = iter(iterables)
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            while not errors:
+                with lock:
+                    iterable = next(pending, None)
+                if iterable is None:
+                    return
+                for item in iterable:
+                    if not put(item):
+                        return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_DONE)
+
+    threads = [threading.Thread(target=worker) for i in range(min(workers, len(iterables)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        done = 0
+        while done < len(threads):
+            item = items.get()
+            if item is _DONE:
+                done += 1
+                if errors:
+                    raise errors[0]
+                continue
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _py_loads(response):
+    """Decodes a response in the ``py`` format.
+    The service returns JSON shaped literals, so :func:`json.loads` is tried first, literal-only python syntax
+    (single quoted strings, None, True, ...) falls back to :func:`ast.literal_eval`
+
+    :param string response: Raw service response
+    """
+    try:
+        return json.loads(response)
+    except ValueError:
+        return ast.literal_eval(response)
+
+
+_PY2 = sys.version_info[0] == 2
+
+
+def _csv_reader(response):
+    """Returns a csv reader over the rows of *response*.
+    The csv module of Python 2 only reads byte strings, the response is read as utf-8 and the values decoded"""
+    if not _PY2:
+        return csv.reader(io.StringIO(response))
+    if isinstance(response, type(u'')):
+        response = response.encode('utf-8')
+    return ([value.decode('utf-8') for value in row] for row in csv.reader(io.BytesIO(response)))
+
+
+def _csv_row(row):
+    """Returns *row* ready for a csv writer, on Python 2 text values are encoded as utf-8"""
+    if not _PY2:
+        return row
+    return [value.encode('utf-8') if isinstance(value, type(u'')) else value for value in row]
+
+
+def _decode(response_format, response):
+    """Decodes a single raw service response in *response_format*
+
+    :param string response_format: One of ``json``, ``py`` or ``csv``
+    :param string response: Raw service response
+    :returns: Dictionary containing the ``HEADER`` and ``ROWS`` of the page
+    :rtype: dict
+    """
+    if response_format == 'json':
+        return json.loads(response)[0]['RESULT']
+    elif response_format == 'py':
+        return _py_loads(response)[0]['RESULT']
+    elif response_format == 'csv':
+        rows = [row for row in _csv_reader(response) if row and row != ['']]
+        return {'HEADER': rows[0] if rows else [], 'ROWS': rows[1:]}
+    raise ValueError('Unsupported response format')
+
+
+def _decode_part(task):
+    """Process pool task, decodes a ``(response_format, shape, response)`` tuple into the part of the result the page
+    contributes, so the rows are built in the worker and sent back in a compact form: the ``json`` text of the rows
+    (shape ``json``), the converted columns (shape ``columns``) or the rows as tuples (shape ``rows``)
+
+    :returns: Tuple of a dictionary with the ``HEADER``, ``TYPES`` and ``PART`` of the page, the number of rows and
+              the decode seconds
+    :rtype: tuple
+    """
+    start = time.time()
+    response_format, shape, response = task
+    page = _decode(response_format,response)
+    header, rows = page['HEADER'], page['ROWS']
+    if shape == 'json':
+        part = json.dumps([dict(zip(header,row)) for row in rows])[1:-1]
+    elif shape == 'columns':
+        types = page.get('TYPES') or [None] * len(header)
+        part = [_convert(values,kind) for values, kind in zip(zip(*rows),types)] if rows else []
+    else:
+        part = [tuple(row) for row in rows]
+    return {'HEADER': header, 'TYPES': page.get('TYPES'), 'PART': part}, len(rows), time.time() - start
+
+
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def _pool_context():
+    """Returns the multiprocessing context of the process pools. Forking a process with running client threads is
+    unsafe, so workers are started with ``forkserver`` where available and with ``spawn`` otherwise"""
+    if not hasattr(multiprocessing,'get_context'):
+        return multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _process_pool(processes):
+    """Returns the process pool with *processes* workers, pools are started once and shared by every client"""
+    with _process_pools_lock:
+        if processes not in _process_pools:
+            _process_pools[processes] = _pool_context().Pool(processes)
+        return _process_pools[processes]
+
+
+def shutdown_process_pools():
+    """Stops the process pools shared by the clients decoding pages in parallel (see :meth:`BaseClient.setProcesses`),
+    decodes that are still running are cancelled. Called at exit, pools are started again when needed"""
+    with _process_pools_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+    for pool in pools:
+        pool.terminate()
+        pool.join()
+
+
+atexit.register(shutdown_process_pools)
+
+
+def _sql_outline(query):
+    """Returns *query* with string literals and parenthesized parts replaced by spaces, keywords found in the outline
+    are at the top level of *query*, at the same position"""
+    outline = []
+    quote = None
+    depth = 0
+    for char in query:
+        if quote is not None:
+            if char == quote:
+                quote = None
+            outline.append(' ')
+        elif char in ('"', "'"):
+            quote = char
+            outline.append(' ')
+        elif char in '()':
+            depth += 1 if char == '(' else -1
+            outline.append(' ')
+        else:
+            outline.append(char if depth == 0 else ' ')
+    return ''.join(outline)
+
+
+def _counted(rows, count):
+    """Yields *rows*, counting them in the first item of the list *count*"""
+    for row in rows:
+        count[0] += 1
+        yield row
+
 
 class BaseClient(object):
     """
@@ -19,15 +292,54 @@ class BaseClient(object):
 
     :param string response_format: Sets the format of the responses
     :param bool onlyActiveCompanies: Set's up the client to only query active companies
+    :param int workers: Number of pages fetched concurrently by :meth:`QueryBuilder.do_query`
+    :param cache: Optional response cache, see :mod:`OpenKVK.cache`
+    :param bool compact: Return ``py`` results as a compact :class:`OpenKVK.result.ResultSet`
+    :param keyset: Unique column (or tuple of columns) to page on instead of LIMIT/OFFSET, see :meth:`setKeysetPagination`
+    :param bool planning: Count the matching rows before fetching pages concurrently, see :meth:`setQueryPlanning`
+    :param rate_limiter: Optional shared :class:`OpenKVK.resilience.RateLimiter`
+    :param retry: Optional :class:`OpenKVK.resilience.RetryPolicy` for transient errors
+    :param breaker: Optional shared :class:`OpenKVK.resilience.CircuitBreaker`
+    :param list observers: Instrumentation observers, see :class:`OpenKVK.instrument.Observer`
+    :param bool coalesce: Share identical concurrent requests, see :meth:`setCoalescing`
+    :param bool streaming: Decode ``json`` and ``py`` pages while they download in iterators, see :meth:`setStreaming`
+    :param bool columnar: Return ``py`` results as a :class:`OpenKVK.result.ColumnSet`, see :meth:`setColumnar`
+    :param int processes: Number of processes decoding concurrently fetched pages, see :meth:`setProcesses`
     """
 
     BASE_URL = "http://api.openkvk.nl/"
     DEFAULT_RESPONSE_FORMAT = "py"
     DEFAULT_LIMIT = 99
+    # smallest number of pages decoded on the process pool, smaller results are decoded faster in the calling thread
+    PARALLEL_PAGES = 16
+    # columns that can't page on their own with keyset pagination, one kvks can have several establishments
+    NON_UNIQUE_COLUMNS = ('kvks', 'sub', 'bedrijfsnaam', 'adres', 'postcode', 'plaats', 'type', 'status',
+                          'rechtsvorm', 'code', 'datum', 'rechtbank')
+    CONNECTION_POOL = ConnectionPool(timeout=30)
+    SINGLE_FLIGHT = SingleFlight()
 
-    def __init__(self,response_format=None,onlyActiveCompanies=True):
+    def __init__(self,response_format=None,onlyActiveCompanies=True,workers=1,cache=None,compact=False,keyset=None,planning=False,
+                 rate_limiter=None,retry=None,breaker=None,observers=None,coalesce=False,
+                 streaming=False,columnar=False,processes=1):
         self.response_format = response_format or BaseClient.DEFAULT_RESPONSE_FORMAT
         self.onlyActiveCompanies = onlyActiveCompanies
+        self.workers = 1
+        self.setWorkers(workers)
+        self.cache = cache
+        self.compact = compact
+        self.keyset = None
+        self.setKeysetPagination(keyset)
+        self.planning = planning
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.observers = list(observers or [])
+        self._local = threading.local()
+        self.coalesce = coalesce
+        self.streaming = streaming
+        self.columnar = columnar
+        self.processes = 1
+        self.setProcesses(processes)
 
 
     def setResponseFormat(self,format):
@@ -57,6 +369,179 @@ class BaseClient(object):
         else:
             raise TypeError('Parameter is not a Boolean value')
 
+    def setWorkers(self,workers):
+        """Sets the number of pages that are fetched concurrently for queries spanning multiple pages
+        Set to 1 to fetch the pages one after another
+
+        :param int workers: Number of concurrent page requests
+        """
+        if not isinstance(workers,int) or isinstance(workers,bool):
+            raise TypeError('Parameter is not an Integer value')
+        if workers < 1:
+            raise ValueError('Number of workers should be at least 1')
+        self.workers = workers
+
+    def setProcesses(self,processes):
+        """Sets the number of processes that decode the pages of concurrently fetched queries (``json`` and ``py``)
+        Pages are decoded in parallel on a process pool shared by every client and merged in page order, results of
+        fewer than :attr:`PARALLEL_PAGES` pages are decoded in the calling thread. Set to 1 to always decode in the
+        calling thread.
+        The workers are started with ``forkserver`` or ``spawn``, so scripts should start with an
+        ``if __name__ == '__main__':`` guard, the pools are stopped at exit by :func:`shutdown_process_pools`
+
+        :param int processes: Number of decoding processes
+        """
+        if not isinstance(processes,int) or isinstance(processes,bool):
+            raise TypeError('Parameter is not an Integer value')
+        if processes < 1:
+            raise ValueError('Number of processes should be at least 1')
+        self.processes = processes
+
+    def setCompact(self,boolean):
+        """Sets the result type of the ``py`` response format
+        If True results are returned as a :class:`OpenKVK.result.ResultSet` of tuple based records, which store
+        the column names once instead of in a dictionary per company.
+        Set to False to return a list of dictionaries
+
+        """
+        if isinstance(boolean,bool):
+            self.compact = boolean
+        else:
+            raise TypeError('Parameter is not a Boolean value')
+
+    def setColumnar(self,boolean):
+        """Sets columnar results for the ``py`` response format
+        If True results are returned as a :class:`OpenKVK.result.ColumnSet`, a list of typed values per column that is
+        built from the pages directly and can be turned into a DataFrame with :meth:`OpenKVK.result.ColumnSet.to_frame`.
+        Takes precedence over :meth:`setCompact`, iterators keep yielding rows
+
+        """
+        if isinstance(boolean,bool):
+            self.columnar = boolean
+        else:
+            raise TypeError('Parameter is not a Boolean value')
+
+    def setKeysetPagination(self,key):
+        """Sets keyset (seek) pagination for queries spanning multiple pages
+        Instead of ``LIMIT 99 OFFSET n`` every page is ordered by *key* and starts after the last row of the previous page,
+        so deep pages are as cheap as the first one and rows can't shift between pages.
+        Pages are fetched one after another. The key columns should together be unique and be part of the selected fields,
+        rows with the same key as the last row of a page are skipped. Queries can't have their own ORDER BY, GROUP BY,
+        LIMIT or OFFSET clause. Set to None to page with LIMIT/OFFSET
+
+        :param key: Column name or tuple of column names, for instance ``'kvk'`` or ``('kvks', 'sub')``,
+                    a single column of :attr:`NON_UNIQUE_COLUMNS` gives a warning
+        """
+        if key is None or isinstance(key,tuple):
+            self.keyset = key
+        elif isinstance(key,(str,list)):
+            self.keyset = (key,) if isinstance(key,str) else tuple(key)
+        else:
+            raise TypeError('Parameter is not a column name')
+        if self.keyset is not None and len(self.keyset) == 1 and self.keyset[0].split('.')[-1] in self.NON_UNIQUE_COLUMNS:
+            warnings.warn("Keyset column {0} is not unique, rows are skipped at page boundaries, page on 'kvk' "
+                          "or ('kvks', 'sub') instead".format(self.keyset[0]), stacklevel=2)
+
+    def setQueryPlanning(self,boolean):
+        """Sets count-first query planning for concurrently fetched queries
+        If True a ``COUNT(*)`` query is done first and no pages past the last matching row are requested.
+        Pages fetched one after another always stop at the first short page, queries without limit are always counted
+
+        """
+        if isinstance(boolean,bool):
+            self.planning = boolean
+        else:
+            raise TypeError('Parameter is not a Boolean value')
+
+    def setRateLimiter(self,rate_limiter):
+        """Sets the :class:`OpenKVK.resilience.RateLimiter` every request waits for, share one instance between clients
+        to throttle all of them together. Set to None to disable rate limiting
+
+        :param rate_limiter: Rate limiter
+        """
+        self.rate_limiter = rate_limiter
+
+    def setRetryPolicy(self,retry):
+        """Sets the :class:`OpenKVK.resilience.RetryPolicy` used to retry failed requests. Set to None to disable retries
+
+        :param retry: Retry policy
+        """
+        self.retry = retry
+
+    def setCircuitBreaker(self,breaker):
+        """Sets the :class:`OpenKVK.resilience.CircuitBreaker` that fails requests fast while the API is down.
+        Set to None to disable
+
+        :param breaker: Circuit breaker
+        """
+        self.breaker = breaker
+
+    def addObserver(self,observer):
+        """Registers an instrumentation observer, see :class:`OpenKVK.instrument.Observer`
+
+        :param observer: Observer to notify of request, parse and query events
+        """
+        self.observers.append(observer)
+
+    def removeObserver(self,observer):
+        """Unregisters an instrumentation observer
+
+        :param observer: Registered observer
+        """
+        self.observers.remove(observer)
+
+    def _observing(self):
+        return bool(self.observers) or getattr(self._local,'stats',None) is not None
+
+    def _notify(self,hook,event):
+        """Passes *event* to the *hook* of every observer and of the statistics of the running query"""
+        stats = getattr(self._local,'stats',None)
+        if stats is not None:
+            getattr(stats,hook)(event)
+        for observer in self.observers:
+            getattr(observer,hook)(event)
+
+    def _observed(self,stats,func,*args,**kwargs):
+        """Calls *func* with *stats* as the statistics of the running query in the current thread"""
+        previous = getattr(self._local,'stats',None)
+        self._local.stats = stats
+        try:
+            return func(*args,**kwargs)
+        finally:
+            self._local.stats = previous
+
+    def setCoalescing(self,boolean):
+        """Sets request coalescing
+        If True, concurrent requests for the same query (from any thread or coalescing client) share a single
+        request to the API through :attr:`SINGLE_FLIGHT`, every caller receives the same response
+
+        """
+        if isinstance(boolean,bool):
+            self.coalesce = boolean
+        else:
+            raise TypeError('Parameter is not a Boolean value')
+
+    def setStreaming(self,boolean):
+        """Sets incremental decoding for :meth:`QueryBuilder.do_iter_query` and the ``iter_*`` methods
+        If True, ``json`` and ``py`` pages are decoded from the response stream and rows are yielded while the rest of
+        the page is still downloading, instead of after reading and decoding the whole page.
+        Streamed pages are not cached, coalesced or reported to observers, so clients with a cache, coalescing or
+        keyset pagination keep reading whole pages
+
+        """
+        if isinstance(boolean,bool):
+            self.streaming = boolean
+        else:
+            raise TypeError('Parameter is not a Boolean value')
+
+    def setCache(self,cache):
+        """Sets the response cache used by :meth:`request`, for instance a :class:`OpenKVK.cache.MemoryCache`
+        Set to None to disable caching
+
+        :param cache: Response cache
+        """
+        self.cache = cache
+
     def _urlencode_query(self,query):
         """encode *query* for use in a url syntax
         :param string query: Validated SQL-92 query as a string
@@ -64,16 +549,104 @@ class BaseClient(object):
         query =query.replace('"', "'")
         return quote(query,safe="*;%'`=&")
 
+    def _build_url(self,query):
+        """Returns the API url for *query* in the current response format
+        :param string query: Validated SQL-92 query as a string
+        """
+        return self.BASE_URL+self.response_format+"/"+self._urlencode_query(query)
+
+    def _cache_key(self,query):
+        """Returns the cache key of *query*, whitespace outside of string literals and a trailing semicolon are ignored
+        :param string query: Validated SQL-92 query as a string
+        """
+        parts = re.split(r"('[^']*')", query.replace('"', "'"))
+        for i in range(0, len(parts), 2):
+            parts[i] = " ".join(parts[i].split())
+        return self.response_format + ":" + "".join(parts).strip().rstrip(';').rstrip()
+
     def request(self,query):
         """
         Returns the raw response of the OpenKVK API.
         You could use this method as a minimalistic wrapper for the API, it should save you 3-4 lines of code
+
+        Connections are taken from :attr:`CONNECTION_POOL`, which is shared by every client in the process.
+        Responses are served from :attr:`cache` when a cache is set.
         """
-        url = BaseClient.BASE_URL+self.response_format+"/"+self._urlencode_query(query)
-        request = urlopen(url)
-        response = request.read().decode('utf-8')
+        if not self._observing():
+            return self._request(query)
+
+        event = {'query': query, 'url': self._build_url(query), 'cache_hit': False, 'attempts': 0, 'bytes': 0, 'error': None}
+        start = time.time()
+        try:
+            return self._request(query,event)
+        except Exception as e:
+            event['error'] = e
+            raise
+        finally:
+            event['seconds'] = time.time() - start
+            self._notify('on_request',event)
+
+    def _request(self,query,event=None):
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(query)
+            response = self.cache.get(key)
+            if response is not None:
+                if event is not None:
+                    event.update(cache_hit=True, bytes=len(response))
+                return response
+
+        url = self._build_url(query)
+        if not self.coalesce:
+            response = self._send(url,event).decode('utf-8')
+        else:
+            flight_key = self.BASE_URL + (key or self._cache_key(query))
+            response, shared = self.SINGLE_FLIGHT.do(flight_key,lambda: self._send(url,event).decode('utf-8'))
+            if shared:
+                if event is not None:
+                    event.update(coalesced=True, bytes=len(response))
+                return response
+        if key is not None:
+            self.cache.set(key,response)
         return response
 
+    def _send(self,url,event=None,stream=False):
+        """Performs the GET request for *url*, applying the rate limiter, retry policy and circuit breaker
+
+        :param string url: Url to request
+        :param dict event: Optional instrumentation event to fill with the attempts and transfer timings
+        :param bool stream: Return the body as an iterator of chunks, only failures before the body is read are retried
+        :returns: Response body
+        :rtype: bytes
+        """
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_request()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if event is not None:
+                event['attempts'] = attempt + 1
+            try:
+                if stream:
+                    body = self.CONNECTION_POOL.stream(url)
+                elif event is None:
+                    body = self.CONNECTION_POOL.urlopen(url)
+                else:
+                    body = self.CONNECTION_POOL.urlopen(url,timings=event)
+            except Exception as e:
+                retry = self.retry or RetryPolicy(retries=0)
+                if self.breaker is not None and retry.is_transient(e):
+                    self.breaker.failure()
+                if attempt >= retry.retries or not retry.is_transient(e):
+                    raise
+                time.sleep(retry.delay(attempt,e))
+                attempt += 1
+                continue
+            if self.breaker is not None:
+                self.breaker.success()
+            return body
+
     def query(self,query):
         return self.request(query)
 
@@ -143,89 +716,369 @@ class QueryBuilder(BaseClient):
         :returns: List of company information dictionaries
         :rtype: list
         """
-        new_result = []
-        for company in result['RESULT']['ROWS']:
-            new_company = {}
-            for i,item in enumerate(company):
-                new_company[result['RESULT']['HEADER'][i]] = item
-            new_result.append(new_company)
+        start = time.time()
+        header = result['RESULT']['HEADER']
+        new_result = [dict(zip(header,company)) for company in result['RESULT']['ROWS']]
+        if self._observing():
+            self._notify('on_parse',{'stage': 'pythonify', 'seconds': time.time() - start, 'rows': len(new_result)})
         return new_result
 
+    def _decode_page(self,response):
+        """Decodes a single raw service response in the current response format
+
+        :param string response: Raw response of :meth:`request`
+        :returns: Dictionary containing the ``HEADER`` and ``ROWS`` of the page
+        :rtype: dict
+        """
+        start = time.time()
+        page = _decode(self.response_format,response)
+        if self._observing():
+            self._notify('on_parse',{'stage': 'decode', 'seconds': time.time() - start, 'rows': len(page['ROWS'])})
+        return page
+
     def _parse_query_results(self,response_buffer):
         """Takes raw response of :class:OpenKVK.Client.Client._do_query and parses the data to the preferred format
         :param list response_buffer: List of service responses
         """
+        if self.response_format not in ['json','py','csv']:
+            raise ValueError('Unsupported response format')
+        start = time.time()
+        if self.processes > 1 and self.response_format != 'csv' and len(response_buffer) >= self.PARALLEL_PAGES:
+            result = self._merge_parts(self._decode_parts_parallel(response_buffer))
+        else:
+            result = self._merge_pages(self._decode_page(response) for response in response_buffer)
+        if self._observing():
+            self._notify('on_parse',{'stage': 'parse', 'seconds': time.time() - start, 'pages': len(response_buffer)})
+        return result
+
+    def _decode_parts_parallel(self,response_buffer):
+        """Decodes the pages of *response_buffer* on the shared process pool, yields their parts (see
+        :func:`_decode_part`) in page order. Pages are sent in batches of several pages to keep the number of round
+        trips to the processes low
+
+        :param list response_buffer: List of service responses
+        """
+        if self.response_format == 'json':
+            shape = 'json'
+        else:
+            shape = 'columns' if self.columnar else 'rows'
+        chunksize = max(1,int(math.ceil(len(response_buffer) / (self.processes * 2.0))))
+        tasks = [(self.response_format,shape,response) for response in response_buffer]
+        for page, rows, seconds in _process_pool(self.processes).imap(_decode_part,tasks,chunksize):
+            if self._observing():
+                self._notify('on_parse',{'stage': 'decode', 'seconds': seconds, 'rows': rows})
+            yield page
+
+    def _merge_parts(self,pages):
+        """Merges the parts of pages decoded by :meth:`_decode_parts_parallel` into a single result in the preferred
+        format, equal to the result of :meth:`_merge_pages`
+
+        :param pages: Iterable of dictionaries with the ``HEADER``, ``TYPES`` and ``PART`` of a page
+        """
+        header, types, parts = [], None, []
+        for page in pages:
+            if not parts:
+                header, types = page['HEADER'], page['TYPES']
+            parts.append(page['PART'])
+        if self.response_format == 'json':
+            return '[' + ', '.join(part for part in parts if part) + ']'
+        if self.columnar:
+            result = ColumnSet(header,types)
+            for part in parts:
+                result.extend_columns(part)
+            return result
+        rows = [row for part in parts for row in part]
+        if self.compact:
+            return ResultSet(header,rows,types)
+        return self._pythonify_result({'RESULT': {'HEADER': header, 'ROWS': rows}})
+
+    def _merge_pages(self,pages):
+        """Merges decoded *pages* into a single result in the preferred format
+        :param pages: Iterable of pages as returned by :meth:`_decode_page`
+        """
+        if self.response_format == 'csv':
+            output = io.BytesIO() if _PY2 else io.StringIO()
+            self._write_csv(pages,output)
+            result = output.getvalue().decode('utf-8') if _PY2 else output.getvalue()
+            return result.rstrip('\n')
+        if self.response_format == 'py' and self.columnar:
+            return ColumnSet.from_pages(pages)
+
         result = {}
+        for page in pages:
+            if not 'RESULT' in result:
+                result['RESULT'] = page
+            else:
+                result['RESULT']['ROWS'] += page['ROWS']
+        if not result:
+            result['RESULT'] = {'HEADER': [], 'ROWS': []}
+
         if self.response_format == 'json':
-            for response in response_buffer:
-                jsonpy = json.loads(response)
-                if not 'RESULT' in result:
-                    result['RESULT'] = jsonpy[0]['RESULT']
-                else:
-                    result['RESULT']['ROWS'] += jsonpy[0]['RESULT']['ROWS']
-            pythonified_result = self._pythonify_result(result)
-            result = json.dumps(pythonified_result)
-        elif self.response_format == 'py':
-            response_buffer = [ast.literal_eval(response) for response in response_buffer]
-            for i in range(len(response_buffer)):
-                if i == 0:
-                    result['RESULT'] = response_buffer[i][0]['RESULT']
-                else:
-                    result['RESULT']['ROWS'] = result['RESULT']['ROWS'] + response_buffer[i][0]['RESULT']['ROWS']
-            pythonified_result = self._pythonify_result(result)
-            result = pythonified_result
-        elif self.response_format == 'csv':
-            header =[]
-            records = []
-            result = []
-            for response in response_buffer:
-                rows = response.split('\n')
-                for a,line in enumerate(rows):
-                        columns = line.split(',')
-                        record = []
-                        for item in columns:
-                            item = item.strip('"')
-                            if a == 0 and len(header) < len(columns):
-                                header.append(item)
-                            elif a != 0:
-                                record.append(item)
-                            else:
-                                continue
-                        if not record == ['']:
-                            records.append(record)
-            result.append(",".join(header))
-            for record in records:
-                if len(record) > 0:
-                    result.append(",".join(record))
-            result = "\n".join(result)
+            return json.dumps(self._pythonify_result(result))
+        elif self.compact:
+            return ResultSet(result['RESULT']['HEADER'],result['RESULT']['ROWS'],result['RESULT'].get('TYPES'))
         else:
-            raise ValueError('Unsupported response format')
+            return self._pythonify_result(result)
 
-        return result
+    def _write_csv(self,pages,target,header=True):
+        """Writes the rows of decoded *pages* as csv to *target*, the header is written once
+
+        :param pages: Iterable of pages as returned by :meth:`_decode_page`
+        :param target: Writable file-like object, a binary file on Python 2
+        :param bool header: Write the header of the first page with a header
+        :returns: Number of rows written
+        :rtype: int
+        """
+        writer = csv.writer(target,lineterminator='\n')
+        count = 0
+        for page in pages:
+            if header and page['HEADER']:
+                header = False
+                writer.writerow(_csv_row(page['HEADER']))
+            writer.writerows(_csv_row(row) for row in page['ROWS'])
+            count += len(page['ROWS'])
+        return count
 
     def do_query(self,basequery,limit,**kwargs):
         """Return query results of *query*
 
+        Pages are fetched one after another, stopping at the first short page, or concurrently when :attr:`workers` is
+        larger than 1.
+
         :param string query: SQL-92 valid query
-        :param int limit: Maximum number of results
+        :param int limit: Maximum number of results, None for all results
         :returns: Result set in set response format
         :rtype:
         """
+        if not self.observers:
+            return self._do_query(basequery,limit,**kwargs)
+        stats = QueryStats(basequery)
+        result = self._observed(stats,self._do_query,basequery,limit,**kwargs)
+        self._summarize(stats)
+        return result
+
+    def _summarize(self,stats):
+        summary = stats.summary()
+        for observer in self.observers:
+            observer.on_query(summary)
+
+    def _do_query(self,basequery,limit,**kwargs):
         query = self._build_query(basequery,**kwargs)
+        if self.keyset or self.workers == 1 or (limit is not None and limit <= BaseClient.DEFAULT_LIMIT):
+            return self._merge_pages(self._iter_pages(query,limit))
+
+        if limit is None or self.planning:
+            total = self._count(query)
+            limit = total if limit is None else min(limit,total)
         query_buffer = self._query_divider(query,limit)
 
-        response_buffer = []
-        for q in range(len(query_buffer)):
-            response = self.request(query_buffer[q])
-            response_buffer.append(response)
+        response_buffer = self._fetch_pages(query_buffer)
         result = self._parse_query_results(response_buffer)
         return result
 
-    def query(self,query):
-        """Returns company information based on a custom query.
-        for direct interaction with the openkvk api, but with the convenience of the parsers used in this module
+    def _count_query(self,query):
+        """Helper function that turns *query* into a ``COUNT(*)`` query with the same filters
+
+        :param string query: SQL-92 compliant query
+        :rtype: string
+        """
+        return re.sub(r'^\s*select\s+.*?\s+from\s', 'SELECT COUNT(*) FROM ', query, count=1, flags=re.IGNORECASE | re.DOTALL) + ';'
+
+    def _count(self,query):
+        """Returns the number of rows matching *query*
+
+        :param string query: SQL-92 compliant query
+        :rtype: int
+        """
+        page = self._decode_page(self.request(self._count_query(query)))
+        return int(page['ROWS'][0][0])
+
+    def _fetch_pages(self,query_buffer):
+        """Requests every query in *query_buffer*, using up to :attr:`workers` concurrent requests
+
+        :param list query_buffer: List of queries as returned by :meth:`_query_divider`
+        :returns: List of raw responses in the order of *query_buffer*
+        :rtype: list
+        """
+        stats = getattr(self._local,'stats',None)
+        if stats is None:
+            return _map_ordered(self.request, query_buffer, self.workers)
+        return _map_ordered(lambda query: self._observed(stats,self.request,query), query_buffer, self.workers)
+
+    def do_iter_query(self,basequery,limit,**kwargs):
+        """Generator version of :meth:`do_query`, yields the results row by row as the pages arrive.
+        Only one page is held in memory at a time, the remaining pages are not requested once a page comes back short.
+
+        :param string query: SQL-92 valid query
+        :param int limit: Maximum number of results
+        :returns: Iterator of company information dictionaries, regardless of the response format,
+                  or of :class:`OpenKVK.result.Record` objects for compact clients
+        :rtype: iterator
+        """
+        query = self._build_query(basequery,**kwargs)
+        pages = self._iter_streamed_pages(query,limit) if self._streams() else self._iter_pages(query,limit)
+        stats = QueryStats(basequery) if self.observers else None
+        while True:
+            page = self._observed(stats,next,pages,None)
+            if page is None:
+                break
+            for row in self._page_rows(page):
+                yield row
+        if stats is not None:
+            self._summarize(stats)
+
+    def _page_rows(self,page):
+        """Yields the rows of a decoded *page* as dictionaries, or as :class:`OpenKVK.result.Record` objects for compact clients
+
+        :param dict page: Page as returned by :meth:`_decode_page`
+        """
+        header = page['HEADER']
+        if self.compact:
+            record = record_type(header)
+            for row in page['ROWS']:
+                yield record(row)
+        else:
+            for row in page['ROWS']:
+                yield dict(zip(header,row))
+
+    def _iter_pages(self,query,limit):
+        """Requests and decodes the pages of a query one at a time, stops after the first short page
+
+        :param string query: SQL-92 compliant query including filters
+        :param int limit: Maximum number of results, None for all results
+        :returns: Iterator of pages as returned by :meth:`_decode_page`
+        """
+        if self.keyset:
+            for page in self._iter_keyset_pages(query,limit,self.keyset):
+                yield page
+            return
+        for page_query in self._page_queries(query,limit):
+            page = self._decode_page(self.request(page_query))
+            yield page
+            if len(page['ROWS']) < BaseClient.DEFAULT_LIMIT:
+                break
+
+    def _page_queries(self,query,limit):
+        """Returns an iterator of LIMIT/OFFSET page queries, endless when *limit* is None"""
+        if limit is None:
+            return ("{0} LIMIT {1} OFFSET {2};".format(query,BaseClient.DEFAULT_LIMIT,offset)
+                    for offset in itertools.count(0,BaseClient.DEFAULT_LIMIT))
+        return self._query_divider(query,limit)
+
+    def _streams(self):
+        return (self.streaming and self.response_format in ('json','py') and not self.keyset
+                and self.cache is None and not self.coalesce)
+
+    def _iter_streamed_pages(self,query,limit):
+        """Streaming version of :meth:`_iter_pages`, the ``ROWS`` of every page are an iterator that decodes the rows
+        while the page downloads. A page must be consumed before the next one is requested
+
+        :param string query: SQL-92 compliant query including filters
+        :param int limit: Maximum number of results, None for all results
+        :returns: Iterator of pages
+        """
+        fallback = _py_loads if self.response_format == 'py' else json.loads
+        for page_query in self._page_queries(query,limit):
+            page, rows = iter_result(self._send(self._build_url(page_query),stream=True),fallback)
+            count = [0]
+            page['ROWS'] = _counted(rows,count)
+            yield page
+            if count[0] < BaseClient.DEFAULT_LIMIT:
+                break
+
+    def _sql_literal(self,value):
+        """Formats *value* as a SQL literal"""
+        if isinstance(value,(int,float)) and not isinstance(value,bool):
+            return str(value)
+        return "'{0}'".format(str(value).replace("'","''"))
+
+    def _keyset_query(self,query,key,after,limit):
+        """Helper function for building a keyset paginated page query
+
+        :param string query: SQL-92 compliant query
+        :param tuple key: Columns to order the rows by
+        :param tuple after: Key values of the last row of the previous page, None for the first page
+        :param int limit: Page size
+        :returns: Page query
+        :rtype: string
+        :raises ValueError: If *query* has an ORDER BY, GROUP BY, LIMIT or OFFSET clause
+        """
+        query = query.strip().rstrip(';').rstrip()
+        outline = _sql_outline(query)
+        if re.search(r'\b(order\s+by|group\s+by|limit|offset)\b',outline,re.IGNORECASE):
+            raise ValueError('Keyset paginated queries can not have an ORDER BY, GROUP BY, LIMIT or OFFSET clause', query)
+        if after is not None:
+            conditions = []
+            for i in range(len(key)):
+                terms = ["{0} = {1}".format(key[j],self._sql_literal(after[j])) for j in range(i)]
+                terms.append("{0} > {1}".format(key[i],self._sql_literal(after[i])))
+                conditions.append(" AND ".join(terms))
+            condition = "({0})".format(" OR ".join("({0})".format(c) for c in conditions) if len(conditions) > 1 else conditions[0])
+            where = re.search(r'\bwhere\b',outline,re.IGNORECASE)
+            if where is None:
+                query += " WHERE " + condition
+            else:
+                # the predicate of the query is kept together, so an OR in it can't bypass the condition
+                query = "{0} ({1}) AND {2}".format(query[:where.end()],query[where.end():].strip(),condition)
+        return "{0} ORDER BY {1} LIMIT {2};".format(query,", ".join(key),limit)
+
+    def _iter_keyset_pages(self,query,limit,key,after=None):
+        """Requests and decodes the pages of *query* one at a time using keyset pagination
+
+        :param string query: SQL-92 compliant query including filters
+        :param int limit: Maximum number of results, None for all results
+        :param tuple key: Columns to page on
+        :param tuple after: Key values to start after, None to start at the first row
+        :returns: Iterator of pages as returned by :meth:`_decode_page`
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = BaseClient.DEFAULT_LIMIT if remaining is None else min(BaseClient.DEFAULT_LIMIT,remaining)
+            page = self._decode_page(self.request(self._keyset_query(query,key,after,size)))
+            yield page
+            rows = page['ROWS']
+            if len(rows) < size:
+                break
+            after = self._keyset_after(page,key)
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def _keyset_after(self,page,key):
+        """Returns the values of the *key* columns in the last row of *page*
+
+        :raises KeyError: If a *key* column is not part of the page
+        """
+        header = [column.split('.')[-1] for column in page['HEADER']]
+        try:
+            index = [header.index(column.split('.')[-1]) for column in key]
+        except ValueError:
+            raise KeyError('Keyset pagination columns should be part of the selected fields', key)
+        return tuple(page['ROWS'][-1][i] for i in index)
+
+    def do_csv_query(self,basequery,limit,target,**kwargs):
+        """Streams the results of *query* as csv to *target*, page by page, without building the result in memory.
+        Works with every response format
+
+        :param string query: SQL-92 valid query
+        :param int limit: Maximum number of results
+        :param target: Writable file-like object, a binary file on Python 2
+        :returns: Number of rows written
+        :rtype: int
+        """
+        pages = self._iter_pages(self._build_query(basequery,**kwargs),limit)
+        if not self.observers:
+            return self._write_csv(pages,target)
+        stats = QueryStats(basequery)
+        count = self._observed(stats,self._write_csv,pages,target)
+        self._summarize(stats)
+        return count
+
+    def _split_limit(self,query):
+        """Splits the LIMIT clause from a custom *query*
 
         :param string query: A SQL-92 query string
+        :returns: Tuple of the query without LIMIT clause and the limit
+        :rtype: tuple
         """
         if isinstance(query,str):
             low = query.lower()
@@ -236,18 +1089,116 @@ class QueryBuilder(BaseClient):
                 query = low.replace(match, "")
             else:
                 limit = BaseClient.DEFAULT_LIMIT
-            return self.do_query(query,limit)
+            return query,limit
         else:
             raise(ValueError('Query parameter should be a string'))
 
+    def query(self,query):
+        """Returns company information based on a custom query.
+        for direct interaction with the openkvk api, but with the convenience of the parsers used in this module
+
+        :param string query: A SQL-92 query string
+        """
+        query,limit = self._split_limit(query)
+        return self.do_query(query,limit)
+
+    def iter_query(self,query):
+        """Generator version of :meth:`query`, yields company information dictionaries page by page
+
+        :param string query: A SQL-92 query string
+        """
+        query,limit = self._split_limit(query)
+        return self.do_iter_query(query,limit)
+
 
 class ApiClient(QueryBuilder):
     """
     The ApiClient is the complete python wrapper for the OpenKVK API.
+    Every ``get_*`` method has an ``iter_*`` counterpart that yields the results row by row.
 
     :param string response_format: Sets the format of the responses
     :param bool onlyActiveCompanies: Set's up the client to only query active companies
     """
+    def _kvk_query(self, kvk, fields):
+        return "SELECT {0} FROM kvk WHERE kvks = {1}".format(",".join(fields),kvk)
+
+    def _name_query(self, name, fields):
+        return "SELECT {0} FROM kvk WHERE bedrijfsnaam ILIKE '%{1}%'".format(",".join(fields),name)
+
+    def _sbi_query(self, sbi, fields):
+        sbi = str(sbi)
+        if sbi.endswith('*'):
+            return "SELECT {0} FROM kvk JOIN kvk_sbi ON kvk_sbi.kvk = kvk.kvk WHERE code LIKE '{1}%'".format(",".join(fields),sbi[:-1])
+        return "SELECT {0} FROM kvk JOIN kvk_sbi ON kvk_sbi.kvk = kvk.kvk WHERE code = '{1}'".format(",".join(fields),sbi)
+
+    def _sbi_codes(self, sbi):
+        """Returns *sbi* as a list of code strings, lists, tuples and sets hold several codes, anything else is one code"""
+        if isinstance(sbi, (list, tuple, set, frozenset)):
+            return [str(code) for code in sbi]
+        return [str(sbi)]
+
+    def _iter_sbi_pages(self, codes, limit, fields, kwargs):
+        """Requests the pages of every SBI code concurrently and yields them without the companies seen before,
+        until *limit* companies are yielded. Companies are identified by their ``kvks``, which is added to *fields*
+        when missing
+
+        :param list codes: SBI codes and code prefixes
+        :param int limit: Maximum number of companies, None for all companies
+        :returns: Iterator of pages as returned by :meth:`_decode_page`
+        """
+        pages = _interleave([self._iter_pages(query,limit) for query in self._sbi_queries(codes,fields,kwargs)],self.workers)
+        seen = set()
+        count = 0
+        try:
+            for page in pages:
+                rows = self._new_rows(page,seen,None if limit is None else limit - count)
+                count += len(rows)
+                if rows:
+                    yield dict(page, ROWS=rows)
+                if limit is not None and count >= limit:
+                    return
+        finally:
+            pages.close()
+
+    def _sbi_queries(self, codes, fields, kwargs):
+        """Returns the queries of every SBI code in *codes*, ``kvks`` is added to *fields* when missing"""
+        if fields != '*' and 'kvks' not in fields:
+            fields = list(fields) + ['kvks']
+        return [self._build_query(self._sbi_query(code,fields),**kwargs) for code in codes]
+
+    def _new_rows(self, page, seen, limit):
+        """Returns the rows of *page* with a ``kvks`` that is not in *seen*, at most *limit* (None for all rows),
+        and adds their ``kvks`` to *seen*"""
+        index = page['HEADER'].index('kvks')
+        rows = []
+        for row in page['ROWS']:
+            if limit is not None and len(rows) >= limit:
+                break
+            if row[index] not in seen:
+                seen.add(row[index])
+                rows.append(row)
+        return rows
+
+    def _city_query(self, city, fields):
+        return "SELECT {0} FROM kvk WHERE plaats ILIKE '%{1}%'".format(",".join(fields),city)
+
+    def _bankruptcies_query(self, fields, kwargs):
+        """Builds the base query for :meth:`get_bankruptcies`, the used search parameter is removed from *kwargs*"""
+        basequery = "SELECT {0} FROM fallissementen ".format(",".join(fields))
+
+        if 'kvk' in kwargs:
+            basequery += "WHERE kvks = {0} ".format(kwargs['kvk'])
+            kwargs.pop('kvk',None)
+        elif 'plaats' in kwargs:
+            basequery += "WHERE plaats ILIKE '%{0}%' ".format(kwargs['plaats'])
+            kwargs.pop('plaats',None)
+        elif 'rechtbank' in kwargs:
+            basequery += "WHERE rechtbank ILIKE '%{0}%' ".format(kwargs['rechtbank'])
+            kwargs.pop('rechtbank', None)
+        else:
+            raise KeyError('Method should at least contain one of the following parameters: "kvk","plaats","rechtbank"')
+        return basequery
+
     def get_by_kvk(self, kvk, fields='*'):
         """Return company information in selected format if the the given *kvk* is found
 
@@ -255,9 +1206,55 @@ class ApiClient(QueryBuilder):
         :param list columns: List of columns
         :returns: Company information
         """
-        basequery = "SELECT {0} FROM kvk WHERE kvks = {1}".format(",".join(fields),kvk)
-        return self.do_query(basequery,1)
+        return self.do_query(self._kvk_query(kvk,fields),1)
+
+    def iter_by_kvk(self, kvk, fields='*'):
+        """Generator version of :meth:`get_by_kvk`"""
+        return self.do_iter_query(self._kvk_query(kvk,fields),1)
+
+    def get_many_by_kvk(self, kvks, fields='*'):
+        """Return company information for many KVK numbers at once.
+        Duplicate numbers are removed and the numbers are looked up in batches of :attr:`DEFAULT_LIMIT` per request,
+        up to :attr:`workers` batches are requested concurrently
+
+        :param list kvks: Iterable of KVK-nummers
+        :param list fields: List of fields to return, ``kvks`` is added when missing
+        :returns: Tuple of a dictionary of company information keyed by KVK-nummer and the set of KVK-nummers that were not found
+        :rtype: tuple
+        """
+        if fields != '*' and 'kvks' not in fields:
+            fields = list(fields) + ['kvks']
+
+        def fetch(batch):
+            # one number can have several establishments, so the batch is paged until its first short page
+            return list(self._iter_pages(self._build_query(self._kvk_batch_query(batch,fields)),None))
 
+        numbers = self._unique_kvks(kvks)
+        batches = [numbers[i:i + BaseClient.DEFAULT_LIMIT] for i in range(0, len(numbers), BaseClient.DEFAULT_LIMIT)]
+        return self._found_by_kvk(numbers,_map_ordered(fetch, batches, self.workers))
+
+    def _unique_kvks(self, kvks):
+        """Returns the KVK-nummers of *kvks* as integers without duplicates, in their original order"""
+        numbers = []
+        seen = set()
+        for kvk in kvks:
+            kvk = int(kvk)
+            if kvk not in seen:
+                seen.add(kvk)
+                numbers.append(kvk)
+        return numbers
+
+    def _kvk_batch_query(self, batch, fields):
+        return "SELECT {0} FROM kvk WHERE kvks IN ({1})".format(",".join(fields),",".join(str(kvk) for kvk in batch))
+
+    def _found_by_kvk(self, numbers, batches):
+        """Returns the result of :meth:`get_many_by_kvk` for *numbers* from the decoded pages of every batch"""
+        found = {}
+        for pages in batches:
+            for page in pages:
+                for row in self._page_rows(page):
+                    found.setdefault(int(row['kvks']), row)
+        return found, set(numbers) - set(found)
 
     def get_by_name(self, name, limit=99, fields='*',**kwargs):
         """Return a list of company information dicts for the given *name* limited to *limit* records
@@ -267,18 +1264,33 @@ class ApiClient(QueryBuilder):
         :param list fields: List of fields to return
         :rtype: list
         """
-        basequery = "SELECT {0} FROM kvk WHERE bedrijfsnaam ILIKE '%{1}%'".format(",".join(fields),name)
-        return self.do_query(basequery,limit,**kwargs)
+        return self.do_query(self._name_query(name,fields),limit,**kwargs)
+
+    def iter_by_name(self, name, limit=99, fields='*',**kwargs):
+        """Generator version of :meth:`get_by_name`"""
+        return self.do_iter_query(self._name_query(name,fields),limit,**kwargs)
 
     def get_by_sbi(self, sbi, limit=99, fields='*',**kwargs):
-        """Return a list of company information *sbicode* limited to *limit* records
+        """Return a list of company information *sbicode* limited to *limit* records.
+        *sbi* may also be a list of codes, codes ending with ``*`` match every code starting with the code before it,
+        for instance ``'62*'`` for the whole sector. The codes are queried concurrently (up to :attr:`workers` at once)
+        and every company is returned once, ``kvks`` is added to *fields* when missing
 
-        :param string name: Name of the company
-        :param int limit: Maximum number of records
+        :param sbi: SBI code or list of codes
+        :param int limit: Maximum number of records in total, None for all records
         :rtype: list
         """
-        basequery = "SELECT {0} FROM kvk JOIN kvk_sbi ON kvk_sbi.kvk = kvk.kvk WHERE code = '{1}'".format(",".join(fields),sbi)
-        return self.do_query(basequery,limit,**kwargs)
+        codes = self._sbi_codes(sbi)
+        if len(codes) == 1 and not codes[0].endswith('*'):
+            return self.do_query(self._sbi_query(codes[0],fields),limit,**kwargs)
+        return self._merge_pages(self._iter_sbi_pages(codes,limit,fields,kwargs))
+
+    def iter_by_sbi(self, sbi, limit=99, fields='*',**kwargs):
+        """Generator version of :meth:`get_by_sbi`"""
+        codes = self._sbi_codes(sbi)
+        if len(codes) == 1 and not codes[0].endswith('*'):
+            return self.do_iter_query(self._sbi_query(codes[0],fields),limit,**kwargs)
+        return (row for page in self._iter_sbi_pages(codes,limit,fields,kwargs) for row in self._page_rows(page))
 
     def get_by_city(self,city,limit=99,fields='*',**kwargs):
         """Return a list of company information *sbicode* limited to *limit* records
@@ -287,8 +1299,11 @@ class ApiClient(QueryBuilder):
         :param int limit: Maximum number of records
         :rtype: list
         """
-        basequery = "SELECT {0} FROM kvk WHERE plaats ILIKE '%{1}%'".format(",".join(fields),city)
-        return self.do_query(basequery,limit,**kwargs)
+        return self.do_query(self._city_query(city,fields),limit,**kwargs)
+
+    def iter_by_city(self,city,limit=99,fields='*',**kwargs):
+        """Generator version of :meth:`get_by_city`"""
+        return self.do_iter_query(self._city_query(city,fields),limit,**kwargs)
 
     def get_bankruptcies(self,fields='*',limit=99,**kwargs):
         """Returns list of bankrupt companies by specified parameters
@@ -303,18 +1318,10 @@ class ApiClient(QueryBuilder):
         :param list fields: List of company information fields to return
         :rtype: list
         """
-        basequery = "SELECT {0} FROM fallissementen ".format(",".join(fields))
-
-        if 'kvk' in kwargs:
-            basequery += "WHERE kvks = {0} ".format(kwargs['kvk'])
-            kwargs.pop('kvk',None)
-        elif 'plaats' in kwargs:
-            basequery += "WHERE plaats ILIKE '%{0}%' ".format(kwargs['plaats'])
-            kwargs.pop('plaats',None)
-        elif 'rechtbank' in kwargs:
-            basequery += "WHERE rechtbank ILIKE '%{0}%' ".format(kwargs['rechtbank'])
-            kwargs.pop('rechtbank', None)
-        else:
-            raise KeyError('Method should at least contain one of the following parameters: "kvk","plaats","rechtbank"')
+        basequery = self._bankruptcies_query(fields,kwargs)
+        return self.do_query(basequery,limit,**kwargs)
 
-        return self.do_query(basequery,limit,**kwargs)
\ No newline at end of file
+    def iter_bankruptcies(self,fields='*',limit=99,**kwargs):
+        """Generator version of :meth:`get_bankruptcies`"""
+        basequery = self._bankruptcies_query(fields,kwargs)
+        return self.do_iter_query(basequery,limit,**kwargs)
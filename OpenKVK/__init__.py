@@ -1,4 +1,8 @@
 __author__ = 'Jeffrey Slort'
-__version__= '0.4'
+__version__= '0.5'
 
-from .Client import *
\ No newline at end of file
+from .Client import *
+
+import sys
+if sys.version_info >= (3, 7):
+    from .aio import AsyncBaseClient, AsyncQueryBuilder, AsyncApiClient
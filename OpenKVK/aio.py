@@ -0,0 +1,545 @@
+import asyncio
+import contextvars
+import socket
+import ssl
+import time
+import weakref
+import zlib
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from .Client import BaseClient, QueryBuilder, ApiClient
+from .instrument import QueryStats
+from .resilience import RetryPolicy
+from .transport import ConnectionPool, _proxy
+
+
+# statistics of the running query, a context variable because every task on the event loop shares the thread
+_STATS = contextvars.ContextVar('OpenKVK.aio.stats', default=None)
+# running requests of coalescing clients per event loop, by url
+_FLIGHTS = weakref.WeakKeyDictionary()
+
+
+def _read_headers(lines):
+    headers = {}
+    for line in lines:
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+async def _read_head(reader):
+    """Reads the status line and headers of a response
+
+    :returns: Tuple of the status code, reason and headers (lowercase names)
+    :rtype: tuple
+    """
+    status_line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+    code, _, reason = status_line.partition(' ')[2].partition(' ')
+    header_lines = []
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        header_lines.append(line)
+    return int(code), reason, _read_headers(header_lines)
+
+
+async def _open(url):
+    """Opens a connection for *url*, directly or through the proxy of the environment like
+    :class:`OpenKVK.transport.ConnectionPool`: http requests are sent to the proxy, https is tunneled with CONNECT
+
+    :returns: Tuple of the stream reader and writer, the request target and additional request headers
+    :rtype: tuple
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    proxy = _proxy(parts.scheme, parts.hostname)
+    if proxy is None:
+        reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=True if secure else None)
+        return reader, writer, path, ''
+
+    authorization = 'Proxy-Authorization: {0}\r\n'.format(proxy[2]) if proxy[2] else ''
+    reader, writer = await asyncio.open_connection(proxy[0], proxy[1])
+    if not secure:
+        # requests to a proxy carry the absolute url
+        return reader, writer, '{0}://{1}{2}'.format(parts.scheme, parts.netloc, path), authorization
+    try:
+        writer.write('CONNECT {0}:{1} HTTP/1.1\r\nHost: {0}:{1}\r\n{2}\r\n'.format(
+            parts.hostname, port, authorization).encode('latin-1'))
+        await writer.drain()
+        code, reason, headers = await _read_head(reader)
+        if code != 200:
+            raise HTTPError(url, code, reason, headers, None)
+        context = ssl.create_default_context()
+        if hasattr(writer, 'start_tls'):
+            await writer.start_tls(context, server_hostname=parts.hostname)
+        else:
+            loop = asyncio.get_event_loop()
+            protocol = writer.transport.get_protocol()
+            transport = await loop.start_tls(writer.transport, protocol, context, server_hostname=parts.hostname)
+            writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer, path, ''
+
+
+async def _exchange(url):
+    """Performs a single GET request for *url*
+
+    :returns: Tuple of the status code, reason, headers (lowercase names) and the undecoded body
+    :rtype: tuple
+    """
+    reader, writer, target, extra = await _open(url)
+    try:
+        request = ("GET {0} HTTP/1.1\r\nHost: {1}\r\nAccept: */*\r\nAccept-Encoding: gzip, deflate\r\n"
+                   "{2}Connection: close\r\n\r\n").format(target, urlsplit(url).netloc, extra)
+        writer.write(request.encode('latin-1'))
+        await writer.drain()
+        code, reason, headers = await _read_head(reader)
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip(), 16)
+                if size == 0:
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+    finally:
+        writer.close()
+    return code, reason, headers, body
+
+
+async def _http_get(url,timeout=None):
+    """Performs a HTTP GET request on the event loop and returns the response body.
+    Like :class:`OpenKVK.transport.ConnectionPool` the proxies of the environment are used and redirects are followed
+
+    :param string url: Url to request
+    :param float timeout: Seconds every request (including redirects) may take, None to wait forever
+    :returns: Response body
+    :rtype: bytes
+    :raises socket.timeout: If a request takes longer than *timeout*
+    """
+    for redirect in range(ConnectionPool.MAX_REDIRECTS + 1):
+        try:
+            code, reason, headers, body = await asyncio.wait_for(_exchange(url), timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout('timed out')
+        location = headers.get('location')
+        if code not in ConnectionPool.REDIRECTS or not location:
+            break
+        url = urljoin(url, location)
+    else:
+        raise HTTPError(url, code, 'Too many redirects', headers, None)
+
+    if code != 200:
+        raise HTTPError(url, code, reason, headers, None)
+    encoding = headers.get('content-encoding', '').lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        try:
+            body = zlib.decompress(body, zlib.MAX_WBITS | 32)
+        except zlib.error:
+            if encoding != 'deflate':
+                raise
+            body = zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class AsyncBaseClient(BaseClient):
+    """
+    Asyncio version of :class:`OpenKVK.Client.BaseClient`.
+    Requests are performed on the event loop, at most *workers* at the same time per client, and time out like the
+    requests of the synchronous clients (after ``CONNECTION_POOL.timeout`` seconds).
+    Every other option of :class:`OpenKVK.Client.BaseClient` (*rate_limiter*, *retry*, *breaker*, *observers*,
+    *coalesce*, ...) is passed on as keyword argument
+
+    :param string response_format: Sets the format of the responses
+    :param bool onlyActiveCompanies: Set's up the client to only query active companies
+    :param int workers: Maximum number of concurrent requests
+    """
+
+    def __init__(self,response_format=None,onlyActiveCompanies=True,workers=10,**kwargs):
+        BaseClient.__init__(self,response_format,onlyActiveCompanies,workers,**kwargs)
+        self._semaphore = None
+
+    def setWorkers(self,workers):
+        BaseClient.setWorkers(self,workers)
+        self._semaphore = None
+
+    def _observing(self):
+        return bool(self.observers) or _STATS.get() is not None
+
+    def _notify(self,hook,event):
+        """Passes *event* to the *hook* of every observer and of the statistics of the running query"""
+        stats = _STATS.get()
+        if stats is not None:
+            getattr(stats,hook)(event)
+        for observer in self.observers:
+            getattr(observer,hook)(event)
+
+    async def request(self,query):
+        """
+        Returns the raw response of the OpenKVK API.
+        The rate limiter, retry policy, circuit breaker, cache, observers and coalescing apply as for
+        :meth:`OpenKVK.Client.BaseClient.request`, waiting is done on the event loop
+        """
+        if not self._observing():
+            return await self._request(query)
+
+        event = {'query': query, 'url': self._build_url(query), 'cache_hit': False, 'attempts': 0, 'bytes': 0, 'error': None}
+        start = time.time()
+        try:
+            return await self._request(query,event)
+        except Exception as e:
+            event['error'] = e
+            raise
+        finally:
+            event['seconds'] = time.time() - start
+            self._notify('on_request',event)
+
+    async def _request(self,query,event=None):
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(query)
+            response = self.cache.get(key)
+            if response is not None:
+                if event is not None:
+                    event.update(cache_hit=True, bytes=len(response))
+                return response
+
+        url = self._build_url(query)
+        if not self.coalesce:
+            response = (await self._send(url,event)).decode('utf-8')
+        else:
+            flights = _FLIGHTS.setdefault(asyncio.get_event_loop(),{})
+            flight_key = self.BASE_URL + (key or self._cache_key(query))
+            flight = flights.get(flight_key)
+            shared = flight is not None
+            if not shared:
+                flight = asyncio.ensure_future(self._send(url,event))
+                flights[flight_key] = flight
+                flight.add_done_callback(lambda flight: flights.pop(flight_key,None))
+            # shielded, so a cancelled caller does not cancel the request of the others
+            response = (await asyncio.shield(flight)).decode('utf-8')
+            if shared:
+                if event is not None:
+                    event.update(coalesced=True, bytes=len(response))
+                return response
+        if key is not None:
+            self.cache.set(key,response)
+        return response
+
+    async def _send(self,url,event=None):
+        """Performs the GET request for *url*, applying the rate limiter, retry policy and circuit breaker.
+        Waiting for the rate limiter and between retries does not hold one of the :attr:`workers` slots
+
+        :param string url: Url to request
+        :param dict event: Optional instrumentation event to fill with the attempts and size
+        :returns: Response body
+        :rtype: bytes
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_request()
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve()
+                if wait:
+                    await asyncio.sleep(wait)
+            if event is not None:
+                event['attempts'] = attempt + 1
+            try:
+                async with self._semaphore:
+                    body = await _http_get(url,self.CONNECTION_POOL.timeout)
+            except Exception as e:
+                retry = self.retry or RetryPolicy(retries=0)
+                if self.breaker is not None and retry.is_transient(e):
+                    self.breaker.failure()
+                if attempt >= retry.retries or not retry.is_transient(e):
+                    raise
+                await asyncio.sleep(retry.delay(attempt,e))
+                attempt += 1
+                continue
+            if self.breaker is not None:
+                self.breaker.success()
+            if event is not None:
+                event['bytes'] = len(body)
+            return body
+
+    async def query(self,query):
+        return await self.request(query)
+
+
+class AsyncQueryBuilder(QueryBuilder, AsyncBaseClient):
+    """
+    Asyncio version of :class:`OpenKVK.Client.QueryBuilder`.
+    All pages of a query are requested concurrently, :meth:`query`, :meth:`do_query` and :meth:`do_csv_query` are
+    coroutines, :meth:`iter_query` and :meth:`do_iter_query` return asynchronous iterators.
+    """
+
+    async def _gather(self,coroutines):
+        """Runs *coroutines* concurrently, the remaining ones are cancelled if one fails
+
+        :returns: List of results in the order of *coroutines*
+        :rtype: list
+        """
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def _fetch_pages(self,query_buffer):
+        """Requests every query in *query_buffer* concurrently, remaining pages are cancelled if one fails
+
+        :param list query_buffer: List of queries as returned by :meth:`_query_divider`
+        :returns: List of raw responses in the order of *query_buffer*
+        :rtype: list
+        """
+        return await self._gather([self.request(q) for q in query_buffer])
+
+    async def _iter_pages(self,query,limit):
+        """Requests and decodes the pages of a query one at a time, stops after the first short page
+
+        :param string query: SQL-92 compliant query including filters
+        :param int limit: Maximum number of results, None for all results
+        :returns: Asynchronous iterator of pages as returned by :meth:`_decode_page`
+        """
+        if self.keyset:
+            async for page in self._iter_keyset_pages(query,limit,self.keyset):
+                yield page
+            return
+        for page_query in self._page_queries(query,limit):
+            page = self._decode_page(await self.request(page_query))
+            yield page
+            if len(page['ROWS']) < BaseClient.DEFAULT_LIMIT:
+                break
+
+    async def _iter_keyset_pages(self,query,limit,key,after=None):
+        """Requests and decodes the pages of *query* one after another using keyset pagination, every page query
+        depends on the last row of the previous page
+
+        :param string query: SQL-92 compliant query including filters
+        :param int limit: Maximum number of results, None for all results
+        :param tuple key: Columns to page on
+        :param tuple after: Key values to start after, None to start at the first row
+        :returns: Asynchronous iterator of pages as returned by :meth:`_decode_page`
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = BaseClient.DEFAULT_LIMIT if remaining is None else min(BaseClient.DEFAULT_LIMIT,remaining)
+            page = self._decode_page(await self.request(self._keyset_query(query,key,after,size)))
+            yield page
+            if len(page['ROWS']) < size:
+                break
+            after = self._keyset_after(page,key)
+            if remaining is not None:
+                remaining -= len(page['ROWS'])
+
+    async def do_iter_query(self,basequery,limit,**kwargs):
+        """Asynchronous generator version of :meth:`do_query`, yields the results row by row as the pages arrive::
+
+            async for company in client.iter_by_city('Utrecht', limit=None):
+                print(company['bedrijfsnaam'])
+
+        :param string query: SQL-92 valid query
+        :param int limit: Maximum number of results
+        :returns: Asynchronous iterator of company information dictionaries, regardless of the response format,
+                  or of :class:`OpenKVK.result.Record` objects for compact clients
+        """
+        pages = self._iter_pages(self._build_query(basequery,**kwargs),limit)
+        stats = QueryStats(basequery) if self.observers else None
+        while True:
+            page = await self._next_page(stats,pages)
+            if page is None:
+                break
+            for row in self._page_rows(page):
+                yield row
+        if stats is not None:
+            self._summarize(stats)
+
+    async def do_csv_query(self,basequery,limit,target,**kwargs):
+        """Writes the results of *query* as csv to *target*, page by page
+
+        :param string query: SQL-92 valid query
+        :param int limit: Maximum number of results
+        :param target: Writable file-like object
+        :returns: Number of rows written
+        :rtype: int
+        """
+        pages = self._iter_pages(self._build_query(basequery,**kwargs),limit)
+        stats = QueryStats(basequery) if self.observers else None
+        count = 0
+        header = True
+        while True:
+            page = await self._next_page(stats,pages)
+            if page is None:
+                break
+            count += self._write_csv([page],target,header)
+            header = header and not page['HEADER']
+        if stats is not None:
+            self._summarize(stats)
+        return count
+
+    async def _observe(self,stats,coroutine):
+        """Awaits *coroutine* with *stats* as the statistics of the running query, tasks it starts inherit them"""
+        token = _STATS.set(stats)
+        try:
+            return await coroutine
+        finally:
+            _STATS.reset(token)
+
+    async def _next_page(self,stats,pages):
+        """Returns the next page of the asynchronous iterator *pages*, None at the end"""
+        try:
+            return await self._observe(stats,pages.__anext__())
+        except StopAsyncIteration:
+            return None
+
+    async def do_query(self,basequery,limit,**kwargs):
+        """Return query results of *query*
+        Pages are requested concurrently, or one after another with keyset pagination
+
+        :param string query: SQL-92 valid query
+        :param int limit: Maximum number of results, None for all results
+        :returns: Result set in set response format
+        """
+        if not self.observers:
+            return await self._do_query(basequery,limit,**kwargs)
+        stats = QueryStats(basequery)
+        result = await self._observe(stats,self._do_query(basequery,limit,**kwargs))
+        self._summarize(stats)
+        return result
+
+    async def _do_query(self,basequery,limit,**kwargs):
+        query = self._build_query(basequery,**kwargs)
+        if self.keyset:
+            return self._merge_pages([page async for page in self._iter_keyset_pages(query,limit,self.keyset)])
+        if limit is None or (self.planning and limit > BaseClient.DEFAULT_LIMIT):
+            total = await self._count(query)
+            limit = total if limit is None else min(limit,total)
+        query_buffer = self._query_divider(query,limit)
+
+        response_buffer = await self._fetch_pages(query_buffer)
+        return self._parse_query_results(response_buffer)
+
+    async def _count(self,query):
+        """Returns the number of rows matching *query*"""
+        page = self._decode_page(await self.request(self._count_query(query)))
+        return int(page['ROWS'][0][0])
+
+
+class AsyncApiClient(AsyncQueryBuilder, ApiClient):
+    """
+    Asyncio version of :class:`OpenKVK.Client.ApiClient`, every ``get_*`` method returns an awaitable and every
+    ``iter_*`` method an asynchronous iterator::
+
+        client = AsyncApiClient()
+        companies = await client.get_by_city('Rotterdam', limit=500)
+        async for company in client.iter_by_city('Utrecht', limit=None):
+            print(company['bedrijfsnaam'])
+
+    :param string response_format: Sets the format of the responses
+    :param bool onlyActiveCompanies: Set's up the client to only query active companies
+    :param int workers: Maximum number of concurrent requests
+    """
+
+    async def get_many_by_kvk(self, kvks, fields='*'):
+        """Asynchronous version of :meth:`OpenKVK.Client.ApiClient.get_many_by_kvk`, the batches are requested
+        concurrently
+
+        :param list kvks: Iterable of KVK-nummers
+        :param list fields: List of fields to return, ``kvks`` is added when missing
+        :returns: Tuple of a dictionary of company information keyed by KVK-nummer and the set of KVK-nummers that were not found
+        :rtype: tuple
+        """
+        if fields != '*' and 'kvks' not in fields:
+            fields = list(fields) + ['kvks']
+
+        async def fetch(batch):
+            # one number can have several establishments, so the batch is paged until its first short page
+            return [page async for page in self._iter_pages(self._build_query(self._kvk_batch_query(batch,fields)),None)]
+
+        numbers = self._unique_kvks(kvks)
+        batches = [numbers[i:i + BaseClient.DEFAULT_LIMIT] for i in range(0, len(numbers), BaseClient.DEFAULT_LIMIT)]
+        return self._found_by_kvk(numbers,await self._gather([fetch(batch) for batch in batches]))
+
+    async def get_by_sbi(self, sbi, limit=99, fields='*',**kwargs):
+        """Asynchronous version of :meth:`OpenKVK.Client.ApiClient.get_by_sbi`
+
+        :param sbi: SBI code or list of codes
+        :param int limit: Maximum number of records in total, None for all records
+        :rtype: list
+        """
+        codes = self._sbi_codes(sbi)
+        if len(codes) == 1 and not codes[0].endswith('*'):
+            return await self.do_query(self._sbi_query(codes[0],fields),limit,**kwargs)
+        return self._merge_pages([page async for page in self._iter_sbi_pages(codes,limit,fields,kwargs)])
+
+    def iter_by_sbi(self, sbi, limit=99, fields='*',**kwargs):
+        """Asynchronous generator version of :meth:`get_by_sbi`"""
+        codes = self._sbi_codes(sbi)
+        if len(codes) == 1 and not codes[0].endswith('*'):
+            return self.do_iter_query(self._sbi_query(codes[0],fields),limit,**kwargs)
+        return self._iter_sbi_rows(codes,limit,fields,kwargs)
+
+    async def _iter_sbi_rows(self, codes, limit, fields, kwargs):
+        async for page in self._iter_sbi_pages(codes,limit,fields,kwargs):
+            for row in self._page_rows(page):
+                yield row
+
+    async def _iter_sbi_pages(self, codes, limit, fields, kwargs):
+        """Asynchronous version of :meth:`OpenKVK.Client.ApiClient._iter_sbi_pages`, the pages of every code are
+        requested concurrently and yielded in the order they arrive, without the companies seen before
+        """
+        queries = self._sbi_queries(codes,fields,kwargs)
+        queue = asyncio.Queue(len(queries))
+
+        async def produce(query):
+            error = None
+            try:
+                async for page in self._iter_pages(query,limit):
+                    await queue.put(page)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            # None marks the end of the pages of this code
+            await queue.put(error)
+
+        tasks = [asyncio.ensure_future(produce(query)) for query in queries]
+        running = len(tasks)
+        seen = set()
+        count = 0
+        try:
+            while running:
+                page = await queue.get()
+                if page is None:
+                    running -= 1
+                    continue
+                if isinstance(page,Exception):
+                    raise page
+                rows = self._new_rows(page,seen,None if limit is None else limit - count)
+                count += len(rows)
+                if rows:
+                    yield dict(page, ROWS=rows)
+                if limit is not None and count >= limit:
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
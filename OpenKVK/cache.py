@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class BaseCache(object):
+    """
+    Base class for response caches used by :class:`OpenKVK.Client.BaseClient`.
+    Subclasses implement :meth:`_get`, :meth:`_set` and :meth:`clear`, this class keeps track of hits and misses
+
+    :param float ttl: Seconds a response stays valid, None to never expire
+    """
+
+    def __init__(self,ttl=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _expires(self):
+        return None if self.ttl is None else time.time() + self.ttl
+
+    def _get(self,key):
+        raise NotImplementedError
+
+    def _set(self,key,value,expires):
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes every cached response"""
+        raise NotImplementedError
+
+    def get(self,key):
+        """Returns the cached response for *key* or None if it is not cached or expired
+
+        :param string key: Normalized query key
+        """
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self,key,value):
+        """Caches response *value* under *key*
+
+        :param string key: Normalized query key
+        :param string value: Raw service response
+        """
+        self._set(key, value, self._expires())
+
+    def stats(self):
+        """Returns the number of cache hits and misses
+
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class MemoryCache(BaseCache):
+    """
+    In-memory response cache, the least recently used response is evicted once *maxsize* responses are cached
+
+    :param int maxsize: Maximum number of cached responses
+    :param float ttl: Seconds a response stays valid, None to never expire
+    """
+
+    def __init__(self,maxsize=1024,ttl=None):
+        BaseCache.__init__(self,ttl)
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _get(self,key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            value, expires = self._data.pop(key)
+            if expires is not None and expires < time.time():
+                return None
+            self._data[key] = (value, expires)
+            return value
+
+    def _set(self,key,value,expires):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileCache(BaseCache):
+    """
+    Persistent response cache, every response is stored as a file in *directory*
+
+    :param string directory: Directory to store the responses in, created if it does not exist
+    :param float ttl: Seconds a response stays valid, None to never expire
+    """
+
+    def __init__(self,directory,ttl=None):
+        BaseCache.__init__(self,ttl)
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self,key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _get(self,key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry['expires'] is not None and entry['expires'] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry['value']
+
+    def _set(self,key,value,expires):
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'key': key, 'expires': expires, 'value': value}, f)
+        getattr(os, 'replace', os.rename)(temp, self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
@@ -1,31 +1,135 @@
 from __future__ import print_function
 import argparse
+import csv
+import json
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
 from OpenKVK import ApiClient
+from OpenKVK.Client import _csv_row
+from OpenKVK.resilience import RetryPolicy
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--kvk','-k',type=int, help="zoek via kvk nummer")
 parser.add_argument('--bedrijfsnaam', '-b',type=str , help="Zoek bedrijf via naam")
 parser.add_argument('--plaats', '-p', type=str,help="zoek per plaats")
+parser.add_argument('--limit', '-l', type=int, default=99, help="maximum aantal resultaten per zoekopdracht")
 parser.add_argument('--output', '-o',type=str,help="output destination")
 parser.add_argument('--format','-f', type=str, help="output format", default="csv")
+parser.add_argument('--input', '-i', type=str, help="bestand met een zoekterm per regel, '-' voor stdin (batch modus)")
+parser.add_argument('--lookup', type=str, choices=['kvk', 'bedrijfsnaam'], default='kvk', help="soort zoekterm in batch modus")
+parser.add_argument('--workers', '-w', type=int, default=8, help="aantal gelijktijdige zoekopdrachten in batch modus")
+
+
+def _read_terms(source):
+    for line in source:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Writer(object):
+    """Writes result rows as NDJSON (format json) or csv as they arrive.
+    The csv columns are the sorted fields of the first row, so the header does not depend on dictionary order"""
+
+    def __init__(self, target, format):
+        self.target = target
+        self.format = format
+        self.writer = None
+        self.fields = None
+
+    def write(self, row):
+        if self.format == 'json':
+            self.target.write(json.dumps(row) + '\n')
+            return
+        if self.writer is None:
+            self.fields = sorted(row)
+            self.writer = csv.writer(self.target, lineterminator='\n')
+            self.writer.writerow(_csv_row(self.fields))
+        self.writer.writerow(_csv_row([row.get(field, '') for field in self.fields]))
+
+
+def batch(args, client):
+    """Looks up every term of the input concurrently and streams the results to the output"""
+    if args.format not in ['json', 'csv']:
+        parser.error("batch modus ondersteunt alleen de formaten json en csv")
+    client.setResponseFormat('py')
+    client.setRetryPolicy(RetryPolicy())
+
+    def lookup(terms):
+        try:
+            if args.lookup == 'kvk':
+                found, missing = client.get_many_by_kvk(terms)
+                return len(terms), list(found.values()), len(missing), None
+            return len(terms), client.get_by_name(terms[0], limit=args.limit), 0, None
+        except Exception as e:
+            return len(terms), [], 0, e
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    target = open(args.output, 'w') if args.output else sys.stdout
+    writer = _Writer(target, args.format)
+    size = ApiClient.DEFAULT_LIMIT if args.lookup == 'kvk' else 1
+    done = rows = not_found = errors = 0
+    start = time.time()
+    pool = ThreadPool(args.workers)
+    try:
+        for count, results, missing, error in pool.imap_unordered(lookup, _chunks(_read_terms(source), size)):
+            for row in results:
+                writer.write(row)
+            done += count
+            rows += len(results)
+            not_found += missing
+            if error is not None:
+                errors += count
+                print("\nfout: {0}".format(error), file=sys.stderr)
+            print("\r{0} zoektermen, {1} resultaten, {2:.1f}/s".format(done, rows, done / max(time.time() - start, 1e-6)),
+                  end='', file=sys.stderr)
+    finally:
+        pool.close()
+        pool.join()
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    print("\n{0} niet gevonden, {1} mislukt".format(not_found, errors), file=sys.stderr)
+
 
 def main():
     args = parser.parse_args()
     client = ApiClient(response_format=args.format)
+    if args.input:
+        client.setWorkers(1)
+        return batch(args, client)
+
     result = None
     if args.kvk:
         result = client.get_by_kvk(kvk=args.kvk)
     elif args.bedrijfsnaam:
-        result = client.get_by_name(args.bedrijfsnaam)
+        result = client.get_by_name(args.bedrijfsnaam,limit=args.limit)
     elif args.plaats:
-        result = client.get_by_city(args.plaats,limit=1)
+        result = client.get_by_city(args.plaats,limit=args.limit)
     else:
         print("Je hebt geen argumenten ingevoerd")
+        return
 
     if args.output:
         with open(args.output, 'w') as o:
             o.write(result)
+    else:
+        print(result)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
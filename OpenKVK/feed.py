@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+
+from .Client import ApiClient
+
+
+class BankruptcyFeed(object):
+    """
+    Change feed over the ``fallissementen`` table: every poll only requests the bankruptcies after the last one seen
+    by the previous poll, the high-water mark, which is stored in a JSON state file between runs::
+
+        feed = BankruptcyFeed('feed.json', plaats='Utrecht')
+        for bankruptcy in feed.watch(interval=300):
+            print(bankruptcy['bedrijfsnaam'], bankruptcy['datum'])
+
+    Rows are requested with keyset pagination ordered on :attr:`KEY`, the mark is stored after every page, so events
+    are delivered at least once. Bankruptcies published later with a date before the mark are not picked up.
+    Several feeds (for instance one per city) can share a state file
+
+    :param string state: Path of the JSON state file
+    :param client: :class:`OpenKVK.Client.ApiClient` used to poll, the response format is set to ``py``
+    :param list fields: List of columns, the :attr:`KEY` columns are added when missing
+    :param string since: Date (``YYYY-MM-DD``) to start at when the feed has no high-water mark yet,
+                         None to start with the complete history
+    :param kwargs: Search parameter (``kvk``, ``plaats`` or ``rechtbank``) and filters, as for
+                   :meth:`OpenKVK.Client.ApiClient.get_bankruptcies`
+    """
+
+    KEY = ('datum', 'kvks')
+    _lock = threading.Lock()
+
+    def __init__(self,state,client=None,fields='*',since=None,**kwargs):
+        self.state = state
+        self.client = client or ApiClient(onlyActiveCompanies=False)
+        self.client.setResponseFormat('py')
+        self.client.setCompact(False)
+        self.client.setColumnar(False)
+        if fields != '*':
+            fields = list(fields) + [column for column in self.KEY if column not in fields]
+        self.since = since
+        self.query = self.client._build_query(self.client._bankruptcies_query(fields,kwargs),**kwargs)
+
+    def _load(self):
+        if not os.path.exists(self.state):
+            return {}
+        with open(self.state) as f:
+            return json.load(f)
+
+    def high_water_mark(self):
+        """Returns the key of the last delivered bankruptcy, None if the feed was never polled
+
+        :rtype: tuple
+        """
+        with self._lock:
+            mark = self._load().get(self.query)
+        return tuple(mark) if mark is not None else None
+
+    def _save(self,mark):
+        with self._lock:
+            state = self._load()
+            state[self.query] = list(mark)
+            temporary = self.state + '.tmp'
+            with open(temporary,'w') as f:
+                json.dump(state,f,indent=1,sort_keys=True)
+            if hasattr(os,'replace'):
+                os.replace(temporary,self.state)
+            else:
+                if os.path.exists(self.state):
+                    os.remove(self.state)
+                os.rename(temporary,self.state)
+
+    def events(self,limit=None):
+        """Yields the bankruptcies after the high-water mark, oldest first, as company information dictionaries.
+        The mark moves forward after every page
+
+        :param int limit: Maximum number of bankruptcies, None for all new bankruptcies
+        :rtype: iterator
+        """
+        after = self.high_water_mark()
+        if after is None and self.since is not None:
+            after = (self.since,-1)
+        for page in self.client._iter_keyset_pages(self.query,limit,self.KEY,after):
+            if not page['ROWS']:
+                break
+            for row in self.client._page_rows(page):
+                yield row
+            header = [column.split('.')[-1] for column in page['HEADER']]
+            self._save([page['ROWS'][-1][header.index(column)] for column in self.KEY])
+
+    def poll(self,limit=None):
+        """Returns the bankruptcies since the previous poll, oldest first
+
+        :param int limit: Maximum number of bankruptcies, None for all new bankruptcies
+        :rtype: list
+        """
+        return list(self.events(limit))
+
+    def watch(self,interval=300):
+        """Polls every *interval* seconds and yields the new bankruptcies, forever
+
+        :param float interval: Seconds between polls
+        :rtype: iterator
+        """
+        while True:
+            for event in self.events():
+                yield event
+            time.sleep(interval)
@@ -0,0 +1,131 @@
+import heapq
+import itertools
+import math
+
+
+EARTH_RADIUS = 6371008.8
+
+
+def distance(lat1,lon1,lat2,lon2):
+    """Returns the great-circle (haversine) distance in meters between two points, coordinates in radians like the
+    ``lat_rad`` and ``lon_rad`` columns
+
+    :rtype: float
+    """
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex(object):
+    """
+    Grid index over points with coordinates in radians, answers radius and nearest neighbour queries by only visiting
+    the grid cells around the query point::
+
+        index = SpatialIndex(cell=500)
+        index.add(lat_rad, lon_rad, company)
+        index.within(lat_rad, lon_rad, 2000)
+        index.k_nearest(lat_rad, lon_rad, 10)
+
+    Cells are square at *latitude*, the default is the latitude of the Netherlands.
+    Longitudes are not wrapped around the antimeridian
+
+    :param float cell: Cell size in meters, about the radius of typical queries
+    :param float latitude: Latitude in radians where cells are square
+    """
+
+    def __init__(self,cell=1000.0,latitude=0.91):
+        self.cell = cell / EARTH_RADIUS
+        self.cell_lon = self.cell / math.cos(latitude)
+        self.cells = {}
+        self.size = 0
+        self.bounds = None
+
+    def __len__(self):
+        return self.size
+
+    def _key(self,lat,lon):
+        return int(math.floor(lat / self.cell)), int(math.floor(lon / self.cell_lon))
+
+    def add(self,lat,lon,item):
+        """Adds *item* at *lat*, *lon* (radians)"""
+        key = self._key(lat,lon)
+        self.cells.setdefault(key,[]).append((lat,lon,item))
+        self.size += 1
+        if self.bounds is None:
+            self.bounds = [key[0],key[0],key[1],key[1]]
+        else:
+            self.bounds = [min(self.bounds[0],key[0]),max(self.bounds[1],key[0]),
+                           min(self.bounds[2],key[1]),max(self.bounds[3],key[1])]
+
+    def _ring(self,i,j,ring):
+        """Yields the occupied cells at Chebyshev distance *ring* from cell *i*, *j*"""
+        if ring == 0:
+            if (i,j) in self.cells:
+                yield self.cells[(i,j)]
+            return
+        if 8 * ring > len(self.cells):
+            for (ci,cj), points in self.cells.items():
+                if max(abs(ci - i),abs(cj - j)) == ring:
+                    yield points
+            return
+        for cj in range(j - ring,j + ring + 1):
+            for ci in (i - ring,i + ring):
+                if (ci,cj) in self.cells:
+                    yield self.cells[(ci,cj)]
+        for ci in range(i - ring + 1,i + ring):
+            for cj in (j - ring,j + ring):
+                if (ci,cj) in self.cells:
+                    yield self.cells[(ci,cj)]
+
+    def _covered(self,lat,ring):
+        """Returns the distance in meters within which every point lies in the first *ring* rings around *lat*"""
+        by_lat = ring * self.cell * EARTH_RADIUS
+        # points outside the rings within the latitude span are at least ring cells away in longitude
+        cos = math.cos(min(math.pi / 2,abs(lat) + (ring + 1) * self.cell))
+        by_lon = 2 * EARTH_RADIUS * math.asin(min(1.0,cos * math.sin(min(math.pi,ring * self.cell_lon) / 2)))
+        return min(by_lat,by_lon)
+
+    def nearest(self,lat,lon,radius=None):
+        """Yields ``(distance, item)`` tuples in order of increasing distance from *lat*, *lon* (radians),
+        rings of cells around the point are only visited as far as the iteration gets
+
+        :param float radius: Maximum distance in meters, None for no maximum
+        :rtype: iterator
+        """
+        if not self.size:
+            return
+        i, j = self._key(lat,lon)
+        last = max(abs(i - self.bounds[0]),abs(i - self.bounds[1]),abs(j - self.bounds[2]),abs(j - self.bounds[3]))
+        heap = []
+        counter = itertools.count()
+        for ring in range(last + 1):
+            for points in self._ring(i,j,ring):
+                for plat, plon, item in points:
+                    d = distance(lat,lon,plat,plon)
+                    if radius is None or d <= radius:
+                        heapq.heappush(heap,(d,next(counter),item))
+            covered = self._covered(lat,ring)
+            while heap and heap[0][0] <= covered:
+                d, n, item = heapq.heappop(heap)
+                yield d, item
+            if radius is not None and covered >= radius:
+                break
+        while heap:
+            d, n, item = heapq.heappop(heap)
+            yield d, item
+
+    def within(self,lat,lon,radius):
+        """Returns the ``(distance, item)`` tuples within *radius* meters of *lat*, *lon* (radians), nearest first
+
+        :rtype: list
+        """
+        return list(self.nearest(lat,lon,radius))
+
+    def k_nearest(self,lat,lon,k,radius=None):
+        """Returns the *k* nearest ``(distance, item)`` tuples of *lat*, *lon* (radians), nearest first
+
+        :param int k: Number of items
+        :param float radius: Maximum distance in meters, None for no maximum
+        :rtype: list
+        """
+        return list(itertools.islice(self.nearest(lat,lon,radius),k))
@@ -0,0 +1,104 @@
+import threading
+import time
+
+
+class Observer(object):
+    """
+    Base class for instrumentation observers, register an instance with :meth:`OpenKVK.Client.BaseClient.addObserver`
+    and override the hooks you need. Every hook receives a dictionary:
+
+    ``on_request``
+        One per page request: ``query``, ``url``, ``seconds``, ``bytes``, ``cache_hit``, ``attempts``, ``error``
+        and for network requests ``wire_bytes`` (transferred, possibly compressed), ``reused`` (keep-alive connection),
+        ``connect``, ``wait`` (server time until the response headers) and ``download`` in seconds.
+        Requests that shared the response of an identical running request have ``coalesced`` set.
+    ``on_parse``
+        One per parse step: ``stage`` and ``seconds``. Stage ``decode`` (one page) and ``pythonify`` also report the
+        number of ``rows``, stage ``parse`` (a whole :meth:`OpenKVK.Client.QueryBuilder._parse_query_results` call)
+        the number of ``pages``.
+    ``on_query``
+        One per :meth:`OpenKVK.Client.QueryBuilder.do_query` call or exhausted iterator,
+        see :meth:`QueryStats.summary`.
+
+    Hooks are called from the thread that performed the work, implementations should be thread safe.
+    """
+
+    def on_request(self,event):
+        pass
+
+    def on_parse(self,event):
+        pass
+
+    def on_query(self,summary):
+        pass
+
+
+class RecordingObserver(Observer):
+    """Observer that keeps every event, for instance to export them to a metrics system in batches"""
+
+    def __init__(self):
+        self.requests = []
+        self.parses = []
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def on_request(self,event):
+        with self._lock:
+            self.requests.append(event)
+
+    def on_parse(self,event):
+        with self._lock:
+            self.parses.append(event)
+
+    def on_query(self,summary):
+        with self._lock:
+            self.queries.append(summary)
+
+
+class QueryStats(object):
+    """
+    Aggregates the request and parse events of a single query
+
+    :param string query: The query being measured
+    """
+
+    def __init__(self,query):
+        self.query = query
+        self.started = time.time()
+        self.pages = 0
+        self.rows = 0
+        self.bytes = 0
+        self.wire_bytes = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.request_seconds = 0.0
+        self.parse_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def on_request(self,event):
+        with self._lock:
+            self.pages += 1
+            self.bytes += event.get('bytes', 0)
+            self.wire_bytes += event.get('wire_bytes', 0)
+            self.retries += max(0, event.get('attempts', 1) - 1)
+            self.cache_hits += 1 if event.get('cache_hit') else 0
+            self.request_seconds += event['seconds']
+
+    def on_parse(self,event):
+        with self._lock:
+            if event['stage'] == 'decode':
+                self.rows += event['rows']
+            if event['stage'] in ('decode', 'pythonify'):
+                self.parse_seconds += event['seconds']
+
+    def summary(self):
+        """Returns the query summary
+
+        :returns: Dictionary with ``query``, ``pages``, ``rows``, ``bytes``, ``wire_bytes`` (transferred, possibly
+                  compressed), ``retries``, ``cache_hits``, ``seconds``,
+                  ``request_seconds`` (summed over concurrent requests) and ``parse_seconds`` (decoding and building rows)
+        :rtype: dict
+        """
+        return {'query': self.query, 'pages': self.pages, 'rows': self.rows, 'bytes': self.bytes, 'wire_bytes': self.wire_bytes,
+                'retries': self.retries, 'cache_hits': self.cache_hits, 'seconds': time.time() - self.started,
+                'request_seconds': self.request_seconds, 'parse_seconds': self.parse_seconds}
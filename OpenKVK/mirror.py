@@ -0,0 +1,286 @@
+import itertools
+import json
+import math
+import sqlite3
+import threading
+
+from .Client import QueryBuilder, ApiClient
+from .geo import SpatialIndex
+from .search import NameIndex
+
+
+class Mirror(object):
+    """
+    Local SQLite copy of the ``kvk``, ``kvk_sbi`` and ``fallissementen`` tables, or filtered slices of them.
+
+    Tables are synced with keyset pagination on their unique key columns, the last synced key (the high-water mark)
+    is stored per slice, so later syncs only request rows after it::
+
+        mirror = Mirror('utrecht.db')
+        mirror.sync('kvk', where="plaats ILIKE '%utrecht%'")
+
+    Incremental syncs don't see changes to rows that were already synced, nor rows added with a key below the mark,
+    like new establishments of an existing ``kvk``. A full sync (``full=True``) requests the whole slice again and
+    replaces every row. Rows removed from the API or moved out of the slice are never deleted from the mirror
+
+    :param string path: Path of the SQLite database, ``:memory:`` for an in-memory mirror
+    :param client: :class:`OpenKVK.Client.QueryBuilder` used to sync, the response format is set to ``py``
+    """
+
+    TABLES = {
+        'kvk': ('kvk',),
+        'kvk_sbi': ('kvk', 'code'),
+        'fallissementen': ('datum', 'kvks'),
+    }
+    INDEXES = {
+        'kvk': ('kvks', 'plaats', 'bedrijfsnaam'),
+        'kvk_sbi': ('code',),
+        'fallissementen': ('plaats', 'rechtbank'),
+    }
+
+    def __init__(self,path,client=None):
+        self.client = client or QueryBuilder(onlyActiveCompanies=False)
+        self.client.setResponseFormat('py')
+        self.client.setCompact(False)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._indexes = {}
+        with self._lock:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS _sync_state (name TEXT PRIMARY KEY, last_key TEXT)")
+            self.connection.commit()
+
+    def _create_table(self,table,header):
+        key = self.TABLES[table]
+        columns = ", ".join('"{0}"'.format(column) for column in header)
+        unique = ", ".join('"{0}"'.format(column) for column in key)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS "{0}" ({1}, UNIQUE ({2}))'.format(table, columns, unique))
+        for column in self.INDEXES.get(table, ()):
+            if column in header:
+                self.connection.execute('CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" ("{1}")'.format(table, column))
+
+    def high_water_mark(self,table,where=None):
+        """Returns the key of the last synced row of a slice, None if it was never synced
+
+        :param string table: Table name
+        :param string where: SQL-92 filter of the slice
+        :rtype: tuple
+        """
+        row = self.connection.execute("SELECT last_key FROM _sync_state WHERE name = ?", (self._slice(table, where),)).fetchone()
+        return tuple(json.loads(row[0])) if row else None
+
+    def _slice(self,table,where):
+        return "{0}|{1}".format(table, where or '')
+
+    def sync(self,table,where=None,limit=None,full=False):
+        """Syncs (a slice of) *table* into the mirror.
+        The first sync of a slice copies every matching row, later syncs only rows after the high-water mark
+
+        :param string table: One of ``kvk``, ``kvk_sbi`` or ``fallissementen``
+        :param string where: SQL-92 filter of the slice, for instance ``"plaats ILIKE '%utrecht%'"``
+        :param int limit: Maximum number of rows to sync, None to sync all rows
+        :param bool full: Sync the slice from the start, refreshing the rows that were synced before
+        :returns: Number of synced rows
+        :rtype: int
+        """
+        if table not in self.TABLES:
+            raise ValueError('Table is not supported by the mirror', table)
+        if not isinstance(full,bool):
+            raise TypeError('Parameter is not a Boolean value')
+        key = self.TABLES[table]
+        query = self.client._build_query("SELECT * FROM {0} WHERE {1}".format(table, where or "1 = 1"))
+        after = None if full else self.high_water_mark(table, where)
+
+        count = 0
+        for page in self.client._iter_keyset_pages(query, limit, key, after):
+            if not page['ROWS']:
+                break
+            header = page['HEADER']
+            index = [header.index(column) for column in key]
+            with self._lock:
+                self._create_table(table, header)
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO "{0}" ({1}) VALUES ({2})'.format(
+                        table, ", ".join('"{0}"'.format(column) for column in header), ", ".join("?" * len(header))),
+                    page['ROWS'])
+                after = tuple(page['ROWS'][-1][i] for i in index)
+                self.connection.execute("INSERT OR REPLACE INTO _sync_state (name, last_key) VALUES (?, ?)",
+                                        (self._slice(table, where), json.dumps(list(after))))
+                self.connection.commit()
+                self.generation += 1
+            count += len(page['ROWS'])
+        return count
+
+    def select(self,query,parameters=()):
+        """Runs a SQLite *query* on the mirror
+
+        :param string query: SQLite query
+        :param tuple parameters: Query parameters
+        :returns: Dictionary with the ``HEADER`` and ``ROWS`` of the result
+        :rtype: dict
+        """
+        with self._lock:
+            cursor = self.connection.execute(query, parameters)
+            rows = [list(row) for row in cursor.fetchall()]
+        return {'HEADER': [column[0] for column in cursor.description], 'ROWS': rows}
+
+    def spatial_index(self,cell=1000.0):
+        """Returns a :class:`OpenKVK.geo.SpatialIndex` of the mirrored ``kvk`` rows with coordinates, the items are
+        SQLite rowids. The index is built on first use and rebuilt after a sync
+
+        :param float cell: Cell size in meters
+        :rtype: OpenKVK.geo.SpatialIndex
+        """
+        cached = self._indexes.get(('spatial',cell))
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        index = SpatialIndex(cell)
+        for rowid, lat, lon in self._kvk_rows("SELECT rowid, lat_rad, lon_rad FROM kvk WHERE lat_rad IS NOT NULL AND lon_rad IS NOT NULL"):
+            if lat != '' and lon != '':
+                index.add(float(lat),float(lon),rowid)
+        self._indexes[('spatial',cell)] = (self.generation,index)
+        return index
+
+    def name_index(self):
+        """Returns a :class:`OpenKVK.search.NameIndex` of the names of the mirrored ``kvk`` rows, the items are
+        SQLite rowids. The index is built on first use and rebuilt after a sync
+
+        :rtype: OpenKVK.search.NameIndex
+        """
+        cached = self._indexes.get('name')
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        index = NameIndex()
+        for rowid, name in self._kvk_rows("SELECT rowid, bedrijfsnaam FROM kvk"):
+            index.add(name,rowid)
+        self._indexes['name'] = (self.generation,index)
+        return index
+
+    def _kvk_rows(self,query):
+        """Returns the rows of *query* on the kvk table, no rows if the table was never synced"""
+        with self._lock:
+            try:
+                return self.connection.execute(query).fetchall()
+            except sqlite3.OperationalError:
+                return []
+
+    def close(self):
+        self.connection.close()
+
+
+class MirrorClient(ApiClient):
+    """
+    ApiClient that answers :meth:`get_by_kvk`, :meth:`get_by_city` and :meth:`get_by_sbi` from a local :class:`Mirror`
+    instead of the OpenKVK API. :meth:`get_by_name` searches a local name index and :meth:`get_nearby` adds
+    location queries.
+    Results are returned in the configured response format, other methods use the API
+
+    :param mirror: Synced :class:`Mirror`
+    :param string response_format: Sets the format of the responses
+    :param bool onlyActiveCompanies: Set's up the client to only query active companies
+    """
+
+    FILTERS = ["kvk","bedrijfsnaam","kvks", "sub","adres","postcode","plaats","type","status","website","vestiging",
+               "rechtsvorm","lat_rad","lon_rad","anbi"]
+
+    def __init__(self,mirror,response_format=None,onlyActiveCompanies=True,**kwargs):
+        ApiClient.__init__(self,response_format,onlyActiveCompanies,**kwargs)
+        self.mirror = mirror
+
+    def _local_query(self,fields,source,condition,parameters,limit,**kwargs):
+        """Runs a query on the mirror and returns the result in the configured response format"""
+        query, parameters = self._local_sql(fields,source,condition,parameters,limit,**kwargs)
+        return self._merge_pages([self.mirror.select(query, parameters)])
+
+    def _local_sql(self,fields,source,condition,parameters,limit,rowid=False,**kwargs):
+        """Returns the SQLite query and parameters selecting *fields*, prefixed with the rowid if *rowid* is set"""
+        columns = "kvk.*" if fields == '*' else ", ".join('kvk."{0}"'.format(field) for field in fields)
+        if rowid:
+            columns = "kvk.rowid, " + columns
+        query = "SELECT {0} FROM {1} WHERE {2}".format(columns, source, condition)
+        parameters = list(parameters)
+        if self.onlyActiveCompanies:
+            query += " AND kvk.status IS NULL"
+        for key in kwargs:
+            if key not in self.FILTERS:
+                raise AttributeError("provided filter is not supported by the Openkvk API", key)
+            query += ' AND kvk."{0}" = ?'.format(key)
+            parameters.append(kwargs[key])
+        if limit is not None:
+            query += " LIMIT {0:d}".format(limit)
+        return query, parameters
+
+    def get_by_kvk(self, kvk, fields='*'):
+        """Return company information in selected format if the the given *kvk* is found in the mirror
+
+        :param int kvk: KVK-nummer
+        :param list fields: List of columns
+        """
+        return self._local_query(fields, "kvk", "kvk.kvks = ?", (kvk,), 1)
+
+    def get_by_city(self,city,limit=99,fields='*',**kwargs):
+        """Return a list of mirrored company information of *city* limited to *limit* records
+
+        :param string city: City name (case insensitive)
+        :param int limit: Maximum number of records, None for all records
+        """
+        return self._local_query(fields, "kvk", "kvk.plaats LIKE ?", ("%{0}%".format(city),), limit, **kwargs)
+
+    def get_by_sbi(self, sbi, limit=99, fields='*',**kwargs):
+        """Return a list of mirrored company information with *sbi* code limited to *limit* records.
+        Like :meth:`OpenKVK.Client.ApiClient.get_by_sbi` *sbi* may be a list of codes and code prefixes ending with ``*``,
+        every company is returned once
+
+        :param sbi: SBI code or list of codes
+        :param int limit: Maximum number of records, None for all records
+        """
+        conditions = []
+        parameters = []
+        for code in self._sbi_codes(sbi):
+            if code.endswith('*'):
+                conditions.append("code LIKE ?")
+                parameters.append(code[:-1] + "%")
+            else:
+                conditions.append("code = ?")
+                parameters.append(code)
+        condition = "kvk.kvk IN (SELECT kvk FROM kvk_sbi WHERE {0})".format(" OR ".join(conditions) or "0")
+        return self._local_query(fields, "kvk", condition, parameters, limit, **kwargs)
+
+    def get_nearby(self, lat, lon, radius=1000, limit=99, fields='*', **kwargs):
+        """Return mirrored company information within *radius* meters of a point, nearest first, limited to *limit* records.
+        Candidates come from the spatial index of the mirror (see :meth:`Mirror.spatial_index`), filters are applied
+        to the candidates in order of distance
+
+        :param float lat: Latitude in degrees
+        :param float lon: Longitude in degrees
+        :param float radius: Maximum distance in meters, None for the nearest *limit* companies at any distance
+        :param int limit: Maximum number of records, None for all records within *radius*
+        """
+        candidates = self.mirror.spatial_index().nearest(math.radians(lat), math.radians(lon), radius)
+        return self._local_rows((rowid for d, rowid in candidates), limit, fields, **kwargs)
+
+    def get_by_name(self, name, limit=99, fields='*',**kwargs):
+        """Return mirrored company information of companies whose name contains *name*, best match first, limited to
+        *limit* records. Names are searched in the name index of the mirror (see :meth:`Mirror.name_index`),
+        case and accent insensitive
+
+        :param string name: (Part of) a company name
+        :param int limit: Maximum number of records, None for all records
+        """
+        return self._local_rows(self.mirror.name_index().ranked(name), limit, fields, **kwargs)
+
+    def _local_rows(self, candidates, limit, fields, **kwargs):
+        """Returns the mirrored rows of the *candidates* (rowids) that pass the filters, in candidate order"""
+        header = []
+        rows = []
+        while limit is None or len(rows) < limit:
+            batch = list(itertools.islice(candidates, max(self.DEFAULT_LIMIT, min(limit or 500, 500))))
+            if not batch:
+                break
+            query, parameters = self._local_sql(fields, "kvk", "kvk.rowid IN ({0})".format(", ".join("?" * len(batch))),
+                                                batch, None, rowid=True, **kwargs)
+            page = self.mirror.select(query, parameters)
+            header = page['HEADER'][1:]
+            found = dict((row[0], row[1:]) for row in page['ROWS'])
+            rows.extend(found[rowid] for rowid in batch if rowid in found)
+        return self._merge_pages([{'HEADER': header, 'ROWS': rows[:limit]}])
@@ -0,0 +1,138 @@
+import random
+import socket
+import threading
+import time
+
+try:
+    from http.client import HTTPException
+    from urllib.error import HTTPError
+except ImportError:
+    from httplib import HTTPException
+    from urllib2 import HTTPError
+
+
+def _header(headers, name):
+    """Returns the value of header *name* (case insensitive) in *headers*, a message or dictionary, None if missing"""
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+class CircuitOpenError(IOError):
+    """Raised instead of performing a request while the :class:`CircuitBreaker` is open"""
+
+
+class RateLimiter(object):
+    """
+    Token bucket rate limiter, one instance can be shared by every client and thread
+
+    :param float rate: Number of requests per second
+    :param int burst: Number of requests that may be done at once after an idle period, defaults to *rate*
+    """
+
+    def __init__(self,rate,burst=None):
+        if rate <= 0:
+            raise ValueError('Rate should be larger than 0')
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be done"""
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def reserve(self):
+        """Takes a token without blocking and returns the number of seconds to wait before the request may be done,
+        for callers that wait themselves like the asyncio clients
+
+        :rtype: float
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RetryPolicy(object):
+    """
+    Retries transient errors with jittered exponential backoff.
+    Connection errors, timeouts and HTTP responses with a status in *statuses* are transient,
+    a ``Retry-After`` header is respected
+
+    :param int retries: Maximum number of retries per request
+    :param float backoff: Base delay in seconds, doubled for every retry
+    :param float max_backoff: Maximum delay in seconds
+    :param tuple statuses: HTTP status codes to retry
+    """
+
+    def __init__(self,retries=3,backoff=0.5,max_backoff=30,statuses=(429,500,502,503,504)):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def is_transient(self,error):
+        """Returns True if the request that raised *error* may succeed when retried"""
+        if isinstance(error,CircuitOpenError):
+            return False
+        if isinstance(error,HTTPError):
+            return error.code in self.statuses
+        return isinstance(error,(socket.error,socket.timeout,HTTPException,IOError))
+
+    def delay(self,attempt,error=None):
+        """Returns the number of seconds to wait before retry *attempt* (starting at 0)"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = _header(getattr(error, 'headers', None) or getattr(error, 'hdrs', None), 'Retry-After')
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.max_backoff, int(retry_after)))
+        return delay
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast with :class:`CircuitOpenError` after *failure_threshold* consecutive failed requests.
+    After *reset_timeout* seconds requests are let through again, the first failure then re-opens the circuit
+
+    :param int failure_threshold: Number of consecutive failures that opens the circuit
+    :param float reset_timeout: Seconds the circuit stays open
+    """
+
+    def __init__(self,failure_threshold=5,reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Raises :class:`CircuitOpenError` while the circuit is open"""
+        with self._lock:
+            if self.opened_at is not None and time.time() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError('OpenKVK API unavailable, circuit is open')
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
@@ -0,0 +1,242 @@
+_record_types = {}
+
+_NUMBERS = {'int': int, 'int2': int, 'int4': int, 'int8': int, 'integer': int, 'smallint': int, 'tinyint': int,
+            'bigint': int, 'serial': int, 'bigserial': int, 'double': float, 'double precision': float, 'float': float,
+            'float4': float, 'float8': float, 'real': float, 'numeric': float, 'decimal': float}
+_BOOLEANS = ('bool', 'boolean')
+_TRUE = ('t', 'true', 'y', 'yes', '1')
+
+
+class Record(tuple):
+    """
+    Company information row of a :class:`ResultSet`.
+    A Record is a tuple that also supports dict style access by column name, the column names are stored once per header
+    """
+    __slots__ = ()
+    HEADER = ()
+    INDEX = {}
+
+    def __getitem__(self,key):
+        if isinstance(key,(int,slice)):
+            return tuple.__getitem__(self,key)
+        return tuple.__getitem__(self,self.INDEX[key])
+
+    def __contains__(self,key):
+        return key in self.INDEX
+
+    def get(self,key,default=None):
+        if key in self.INDEX:
+            return tuple.__getitem__(self,self.INDEX[key])
+        return default
+
+    def keys(self):
+        return list(self.HEADER)
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return list(zip(self.HEADER,self))
+
+    def to_dict(self):
+        """Returns the record as a company information dictionary
+
+        :rtype: dict
+        """
+        return dict(zip(self.HEADER,self))
+
+    def __repr__(self):
+        return 'Record({0!r})'.format(self.to_dict())
+
+
+def record_type(header):
+    """Returns the :class:`Record` subclass for *header*, one class is created per distinct header
+
+    :param list header: Column names
+    """
+    header = tuple(header)
+    if header not in _record_types:
+        index = dict((name,i) for i,name in enumerate(header))
+        _record_types[header] = type('Record', (Record,), {'__slots__': (), 'HEADER': header, 'INDEX': index})
+    return _record_types[header]
+
+
+class ResultSet(object):
+    """
+    Compact query result, the header is stored once and every row is a :class:`Record`
+
+    :param list header: Column names
+    :param list rows: List of row value lists
+    :param list types: Column types as returned by the service
+    """
+
+    def __init__(self,header,rows,types=None):
+        self.header = list(header)
+        self.types = list(types) if types is not None else None
+        record = record_type(self.header)
+        self.rows = [record(row) for row in rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self,index):
+        return self.rows[index]
+
+    def __repr__(self):
+        return 'ResultSet(header={0!r}, rows={1})'.format(self.header,len(self.rows))
+
+    def column(self,name):
+        """Returns all values of column *name*
+
+        :param string name: Column name
+        :rtype: list
+        """
+        index = self.header.index(name)
+        return [row[index] for row in self.rows]
+
+    def to_dicts(self):
+        """Returns the result as a list of company information dictionaries
+
+        :rtype: list
+        """
+        return [row.to_dict() for row in self.rows]
+
+    def to_columns(self):
+        """Returns the result as a :class:`ColumnSet`
+
+        :rtype: ColumnSet
+        """
+        columns = ColumnSet(self.header,self.types)
+        columns.extend(self.rows)
+        return columns
+
+
+def _unique(header):
+    """Returns the column names of *header*, repeated names get a ``_1``, ``_2``, ... suffix"""
+    names = []
+    taken = set(header)
+    seen = set()
+    for name in header:
+        unique = name
+        count = 0
+        # a suffixed name may not take the name of a later column
+        while unique in seen or (count and unique in taken):
+            count += 1
+            unique = "{0}_{1}".format(name,count)
+        seen.add(unique)
+        names.append(unique)
+    return names
+
+
+def _convert(values,kind):
+    """Converts the values of a column to the Python type of the service column type *kind*.
+    Numeric and boolean values that are already of the right type are kept, empty strings become None
+
+    :param values: Column values
+    :param string kind: Service column type, for instance ``bigint`` or ``double``
+    :rtype: list
+    """
+    kind = (kind or '').lower()
+    if kind in _NUMBERS:
+        number = _NUMBERS[kind]
+        return [value if value is None or type(value) is number else None if value == '' else number(value)
+                for value in values]
+    if kind in _BOOLEANS:
+        return [value if value is None or isinstance(value,bool) else None if value == '' else str(value).lower() in _TRUE
+                for value in values]
+    return list(values)
+
+
+class ColumnSet(object):
+    """
+    Columnar query result, the values of every column are kept in a list and converted to the Python type of the
+    column type reported by the service (numbers and booleans), no object is built per row.
+    Duplicate column names, like the two ``kvk`` columns of a join, are made unique by appending ``_1``, ``_2``, ...::
+
+        result = client.get_by_sbi('62.01', limit=100000)
+        result['postcode']
+        frame = result.to_frame()
+
+    :param list header: Column names
+    :param list types: Column types as returned by the service
+    """
+
+    def __init__(self,header,types=None):
+        self.header = _unique(header)
+        self.types = list(types) if types is not None else None
+        self._columns = [[] for name in self.header]
+        self.columns = dict(zip(self.header,self._columns))
+
+    @classmethod
+    def from_pages(cls,pages):
+        """Builds a ColumnSet from decoded pages, the rows of every page are transposed to columns directly
+
+        :param pages: Iterable of dictionaries with the ``HEADER``, ``TYPES`` and ``ROWS`` of a page
+        :rtype: ColumnSet
+        """
+        result = None
+        for page in pages:
+            if result is None:
+                result = cls(page['HEADER'],page.get('TYPES'))
+            result.extend(page['ROWS'])
+        return result if result is not None else cls([])
+
+    def extend(self,rows):
+        """Appends *rows* (lists of values in header order) to the columns
+
+        :param list rows: Rows to append
+        """
+        if not rows:
+            return
+        types = self.types or [None] * len(self.header)
+        for column, kind, values in zip(self._columns,types,zip(*rows)):
+            column.extend(_convert(values,kind))
+
+    def extend_columns(self,columns):
+        """Appends *columns* (lists of converted values in header order) to the columns
+
+        :param list columns: Columns to append, empty to append nothing
+        """
+        for column, values in zip(self._columns,columns):
+            column.extend(values)
+
+    def __len__(self):
+        return len(self._columns[0]) if self._columns else 0
+
+    def __getitem__(self,name):
+        return self.columns[name]
+
+    def __contains__(self,name):
+        return name in self.columns
+
+    def __repr__(self):
+        return 'ColumnSet(header={0!r}, rows={1})'.format(self.header,len(self))
+
+    def column(self,name):
+        """Returns all values of column *name*
+
+        :param string name: Column name
+        :rtype: list
+        """
+        return self.columns[name]
+
+    def to_dicts(self):
+        """Returns the result as a list of company information dictionaries
+
+        :rtype: list
+        """
+        return [dict(zip(self.header,row)) for row in zip(*self._columns)]
+
+    def to_frame(self):
+        """Returns the result as a :class:`pandas.DataFrame`, requires pandas
+
+        :rtype: pandas.DataFrame
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError('ColumnSet.to_frame requires pandas')
+        return pandas.DataFrame(self.columns,columns=self.header)
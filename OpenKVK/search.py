@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+import unicodedata
+
+
+_START = u'\x01\x01'
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(name):
+    """Returns *name* in the form it is indexed and searched in: lowercase, without accents and with punctuation
+    replaced by single spaces, so ``"Café 't Hoekje B.V."`` becomes ``"cafe t hoekje b v"``
+
+    :param string name: Company name
+    :rtype: string
+    """
+    if isinstance(name,bytes):
+        name = name.decode('utf-8')
+    name = unicodedata.normalize('NFKD',name)
+    name = u''.join(char for char in name if not unicodedata.combining(char))
+    return _SEPARATORS.sub(u' ',name.lower()).strip()
+
+
+def _trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class NameIndex(object):
+    """
+    Trigram index over company names for substring and prefix search without scanning every name::
+
+        index = NameIndex()
+        for company in client.iter_by_city('Utrecht', limit=None):
+            index.add(company['bedrijfsnaam'], company)
+        index.search('bakkerij', limit=10)
+
+    Every name is indexed with the trigrams of its normalized form (see :func:`normalize`), including trigrams
+    marking the start of the name. A search only verifies the names in the shortest posting list of the trigrams
+    of the query. Results are ranked: exact matches, then names starting with the query, then names with a word
+    starting with the query, then other matches. Shorter names rank first within each group.
+    Posting lists are sorted by name length when they are first searched, so a search stops at the first matches.
+    An index can be searched from several threads, also while names are added
+    """
+
+    def __init__(self):
+        self.names = []
+        self.items = []
+        self.postings = {u'': []}
+        self._sorted = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self,name,item):
+        """Adds *item* under *name*
+
+        :param string name: Company name
+        :param item: Object returned by searches, for instance a company dictionary or a row id
+        """
+        name = normalize(name or u'')
+        position = len(self.names)
+        self.names.append(name)
+        self.items.append(item)
+        with self._lock:
+            for gram in _trigrams(_START + name) | set([u'']):
+                self.postings.setdefault(gram,[]).append(position)
+                self._sorted.discard(gram)
+
+    def _candidates(self,text):
+        """Returns the positions of the names that may contain *text*, shortest names first.
+        Every position is a candidate when *text* has no trigrams"""
+        grams = _trigrams(text) or set([u''])
+        gram = min(grams,key=lambda gram: len(self.postings.get(gram,())))
+        if gram not in self.postings:
+            return ()
+        with self._lock:
+            if gram not in self._sorted:
+                names = self.names
+                # sorted into a new list, searches still iterating the old list are not affected
+                self.postings[gram] = sorted(self.postings[gram],key=lambda position: (len(names[position]),position))
+                self._sorted.add(gram)
+            return self.postings[gram]
+
+    def _tier(self,text,match):
+        """Yields the items of the names matching *match* among the candidates of *text*, shortest names first"""
+        names = self.names
+        for position in self._candidates(text):
+            if match(names[position]):
+                yield self.items[position]
+
+    def ranked(self,query,prefix=False):
+        """Yields the items whose name contains *query*, best match first.
+        Every rank is only searched once the previous ones are exhausted, taking the first few results is cheap
+
+        :param string query: (Part of) a company name
+        :param bool prefix: Only match names starting with *query*
+        :rtype: iterator
+        """
+        query = normalize(query)
+        if not query:
+            return
+        word = u' ' + query
+        tiers = [(_START + query, lambda name: name.startswith(query))]
+        if not prefix:
+            tiers.append((word, lambda name: not name.startswith(query) and word in name))
+            tiers.append((query, lambda name: query in name and not name.startswith(query) and word not in name))
+        for text, match in tiers:
+            for item in self._tier(text,match):
+                yield item
+
+    def search(self,query,limit=10,prefix=False):
+        """Returns the items whose name contains *query*, best match first
+
+        :param string query: (Part of) a company name
+        :param int limit: Maximum number of items, None for all items
+        :param bool prefix: Only match names starting with *query*
+        :rtype: list
+        """
+        results = []
+        for item in self.ranked(query,prefix):
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(item)
+        return results
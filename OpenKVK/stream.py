@@ -0,0 +1,165 @@
+import codecs
+import json
+import re
+
+
+_KEY = re.compile(r'"(TYPES|HEADER|ROWS)"\s*:\s*')
+_SEPARATOR = re.compile(r'[\s,]*')
+_DECODER = json.JSONDecoder()
+_ROW_TOKEN = re.compile(r'[\[\]"\']')
+
+
+def _row_end(text,start):
+    """Returns the position after the list starting at *start* in *text*, None if the list is not complete yet.
+    Brackets inside single or double quoted strings are skipped"""
+    depth = 0
+    pos = start
+    while True:
+        match = _ROW_TOKEN.search(text, pos)
+        if match is None:
+            return None
+        token = match.group()
+        pos = match.end()
+        if token == '[':
+            depth += 1
+        elif token == ']':
+            depth -= 1
+            if depth == 0:
+                return pos
+        else:
+            while True:
+                if pos >= len(text):
+                    return None
+                if text[pos] == '\\':
+                    pos += 2
+                elif text[pos] == token:
+                    pos += 1
+                    break
+                else:
+                    pos += 1
+
+
+class _RowReader(object):
+    """Incremental reader of a ``[{"RESULT": {"TYPES": [..], "HEADER": [..], "ROWS": [[..], ..]}}]`` response"""
+
+    def __init__(self,chunks,fallback=json.loads):
+        self.chunks = iter(chunks)
+        self.fallback = fallback
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.done = False
+        # the text read so far is kept until the first row decodes, to fall back on a complete decode
+        self.text = []
+
+    def more(self):
+        """Appends the next chunk to the buffer, returns False at the end of the response"""
+        if self.done:
+            return False
+        try:
+            text = self.decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.done = True
+            text = self.decoder.decode(b'', True)
+        if self.text is not None:
+            self.text.append(text)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def result(self):
+        """Decodes the members before ``ROWS`` and positions the reader at the first row
+
+        :raises ValueError: If the response does not have the expected structure
+        """
+        result = {}
+        while True:
+            match = _KEY.search(self.buffer, self.pos)
+            if match is None or match.end() == len(self.buffer):
+                if not self.more():
+                    raise ValueError('Response has no ROWS')
+                continue
+            if match.group(1) == 'ROWS':
+                if 'HEADER' not in result:
+                    raise ValueError('Response has no HEADER before its ROWS')
+                if self.buffer[match.end()] != '[':
+                    raise ValueError('ROWS is not a list')
+                self.pos = match.end() + 1
+                return result
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, match.end())
+            except ValueError:
+                if not self.more():
+                    raise
+                continue
+            result[match.group(1)] = value
+            self.pos = end
+
+    def rows(self):
+        """Yields the rows one by one as soon as they are complete"""
+        while True:
+            start = _SEPARATOR.match(self.buffer, self.pos).end()
+            if start == len(self.buffer):
+                self.pos = start
+                if not self.more():
+                    raise ValueError('Response ended inside ROWS')
+                continue
+            if self.buffer[start] == ']':
+                self.pos = start + 1
+                return
+            try:
+                row, end = _DECODER.raw_decode(self.buffer, start)
+            except ValueError:
+                end = _row_end(self.buffer, start)
+                if end is None:
+                    # rows are lists, an incomplete row never decodes
+                    self.pos = start
+                    if not self.more():
+                        raise
+                    continue
+                # a complete row that isn't JSON, like a row with Python literals
+                row = self.fallback(self.buffer[start:end])
+            self.pos = end
+            self.text = None
+            yield row
+
+    def rest(self):
+        """Reads the remainder of the response and returns the complete text, only available before the first row"""
+        while self.more():
+            pass
+        return ''.join(self.text)
+
+
+def iter_result(chunks,fallback=json.loads):
+    """Decodes an OpenKVK ``json`` or ``py`` response while it is being read.
+    The members before ``ROWS`` are decoded first, the rows are decoded one at a time as the chunks containing them
+    arrive, so only a single row and the unread part of the current chunk are held in memory.
+
+    Rows that aren't JSON, like rows of ``py`` responses with Python literals, are decoded one by one with *fallback*.
+    Responses that can't be decoded incrementally, like responses with the ``HEADER`` after the ``ROWS``, are read
+    completely and decoded with *fallback* instead
+
+    :param chunks: Iterator of response body chunks (bytes), for instance from
+                   :meth:`OpenKVK.transport.ConnectionPool.stream`
+    :param callable fallback: Function decoding a complete response text or a single row
+    :returns: Tuple of a dictionary with the ``HEADER`` (and ``TYPES``) of the result and an iterator of rows
+    :rtype: tuple
+    """
+    reader = _RowReader(chunks,fallback)
+    try:
+        result = reader.result()
+    except ValueError:
+        result = fallback(reader.rest())[0]['RESULT']
+        return result, iter(result['ROWS'])
+    return result, _rows(reader, fallback)
+
+
+def _rows(reader,fallback):
+    try:
+        for row in reader.rows():
+            yield row
+    except ValueError:
+        if reader.text is None:
+            raise
+        for row in fallback(reader.rest())[0]['RESULT']['ROWS']:
+            yield row
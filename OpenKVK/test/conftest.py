@@ -0,0 +1,6 @@
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # the asyncio clients and their tests need Python 3.7
+    collect_ignore.append('test_aio.py')
@@ -0,0 +1,327 @@
+import asyncio
+import io
+import os
+import re
+import socket
+import time
+import unittest
+
+import pytest
+
+from urllib.error import HTTPError
+
+from OpenKVK import AsyncApiClient, AsyncBaseClient, AsyncQueryBuilder, aio
+from OpenKVK.instrument import RecordingObserver
+from OpenKVK.resilience import CircuitBreaker, CircuitOpenError, RateLimiter, RetryPolicy
+
+
+def page(offset):
+    return '[{{"RESULT":{{"TYPES":["int"],"HEADER":["offset"],"ROWS":[[{0}]]}}}}]'.format(offset)
+
+
+def numbered(query, total=150):
+    """Page of *query* in a result with the numbers up to *total*"""
+    offset = int(query.rstrip(';').split(' ')[-1])
+    rows = ','.join('[{0}]'.format(n) for n in range(offset, min(offset + 99, total)))
+    return '[{{"RESULT":{{"TYPES":["int"],"HEADER":["offset"],"ROWS":[{0}]}}}}]'.format(rows)
+
+
+class TestAsyncQueryBuilder(unittest.TestCase):
+    def setUp(self):
+        self.client = AsyncQueryBuilder(workers=4)
+
+    def test_do_query(self):
+        async def request(query):
+            await asyncio.sleep(0.01 if 'OFFSET 0;' in query else 0)
+            return page(int(query.rstrip(';').split(' ')[-1]))
+
+        self.client.request = request
+        result = asyncio.run(self.client.do_query("x", 300))
+        assert([row['offset'] for row in result] == [0, 99, 198, 297])
+
+    def test_do_query_failure_cancels_pages(self):
+        cancelled = []
+
+        async def request(query):
+            if 'OFFSET 0;' in query:
+                raise IOError('page failed')
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(query)
+                raise
+
+        self.client.request = request
+        with pytest.raises(IOError):
+            asyncio.run(self.client.do_query("x", 300))
+        assert(len(cancelled) == 3)
+
+    def test_do_query_keyset(self):
+        requests = []
+
+        async def request(query):
+            requests.append(query)
+            match = re.search(r'kvk > (\d+)', query)
+            start = int(match.group(1)) + 1 if match else 0
+            size = int(query.rstrip(';').split(' ')[-1])
+            rows = ','.join('[{0}]'.format(n) for n in range(start, min(start + size, 150)))
+            return '[{{"RESULT":{{"TYPES":["int"],"HEADER":["kvk"],"ROWS":[{0}]}}}}]'.format(rows)
+
+        async def collect():
+            return [row['kvk'] async for row in self.client.do_iter_query("SELECT * FROM kvk", 120)]
+
+        self.client.setKeysetPagination('kvk')
+        self.client.request = request
+        result = asyncio.run(self.client.do_query("SELECT * FROM kvk", None))
+        assert([row['kvk'] for row in result] == list(range(150)))
+        assert(len(requests) == 2)
+        assert('OFFSET' not in requests[1] and 'kvk > 98' in requests[1])
+        assert(asyncio.run(collect()) == list(range(120)))
+
+    def test_do_iter_query(self):
+        requests = []
+
+        async def request(query):
+            requests.append(query)
+            return numbered(query)
+
+        async def collect():
+            return [row['offset'] async for row in self.client.do_iter_query("SELECT * FROM kvk", None)]
+
+        self.client.request = request
+        assert(asyncio.run(collect()) == list(range(150)))
+        assert(len(requests) == 2)
+
+    def test_do_csv_query(self):
+        async def request(query):
+            return numbered(query, 100)
+
+        self.client.request = request
+        target = io.StringIO()
+        count = asyncio.run(self.client.do_csv_query("x", None, target))
+        assert(count == 100)
+        assert(target.getvalue() == 'offset\n' + ''.join('{0}\n'.format(n) for n in range(100)))
+
+
+class TestAsyncResilience(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.errors = []
+        self._http_get = aio._http_get
+
+        async def http_get(url, timeout=None):
+            self.calls.append(url)
+            await asyncio.sleep(0.01)
+            if self.errors:
+                raise self.errors.pop(0)
+            return b'[{"RESULT":{"TYPES":["int"],"HEADER":["offset"],"ROWS":[[0]]}}]'
+
+        aio._http_get = http_get
+
+    def tearDown(self):
+        aio._http_get = self._http_get
+
+    def test_retry(self):
+        self.errors = [IOError('reset'), IOError('reset')]
+        client = AsyncBaseClient(retry=RetryPolicy(retries=2, backoff=0))
+        assert(asyncio.run(client.request("SELECT 1")).startswith('[{'))
+        assert(len(self.calls) == 3)
+
+    def test_breaker(self):
+        self.errors = [IOError('reset')] * 2
+        client = AsyncBaseClient(breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for i in range(2):
+            with pytest.raises(IOError):
+                asyncio.run(client.request("SELECT 1"))
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(client.request("SELECT 1"))
+        assert(len(self.calls) == 2)
+
+    def test_rate_limiter(self):
+        client = AsyncBaseClient(rate_limiter=RateLimiter(100, burst=1))
+
+        async def run():
+            await asyncio.gather(*[client.request("SELECT {0}".format(i)) for i in range(6)])
+
+        start = time.time()
+        asyncio.run(run())
+        assert(time.time() - start >= 0.045)
+
+    def test_observers(self):
+        observer = RecordingObserver()
+        client = AsyncQueryBuilder(observers=[observer], workers=4)
+
+        async def collect():
+            return [row async for row in client.do_iter_query("SELECT * FROM kvk", 300)]
+
+        asyncio.run(client.do_query("SELECT * FROM kvk", 300))
+        assert(len(observer.requests) == 4)
+        assert(all(event['attempts'] == 1 and event['bytes'] > 0 for event in observer.requests))
+        assert(len(observer.queries) == 1 and observer.queries[0]['pages'] == 4)
+        assert(len(asyncio.run(collect())) == 1)
+        assert(observer.queries[1]['pages'] == 1 and observer.queries[1]['rows'] == 1)
+
+    def test_coalesce(self):
+        observer = RecordingObserver()
+        client = AsyncBaseClient(coalesce=True, observers=[observer])
+
+        async def run():
+            return await asyncio.gather(*[client.request("SELECT 1") for i in range(3)])
+
+        responses = asyncio.run(run())
+        assert(len(set(responses)) == 1)
+        assert(len(self.calls) == 1)
+        assert(sum(1 for event in observer.requests if event.get('coalesced')) == 2)
+
+
+def serve(respond, coroutine):
+    """Runs *coroutine(url)* against a local server answering every request with *respond(request_line)*,
+    which returns the raw response or None to never answer. Returns the result and the request lines"""
+    requests = []
+
+    async def handle(reader, writer):
+        line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+        requests.append(line)
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        response = respond(line)
+        if response is None:
+            await asyncio.sleep(10)
+        writer.write(response)
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        url = 'http://127.0.0.1:{0}/'.format(server.sockets[0].getsockname()[1])
+        try:
+            return await coroutine(url)
+        finally:
+            server.close()
+
+    return asyncio.run(run()), requests
+
+
+def ok(body):
+    return 'HTTP/1.1 200 OK\r\nContent-Length: {0}\r\n\r\n{1}'.format(len(body), body).encode('latin-1')
+
+
+class TestHttpGet(unittest.TestCase):
+    def setUp(self):
+        self.environ = dict(os.environ)
+        for name in ('no_proxy', 'NO_PROXY', 'http_proxy', 'HTTP_PROXY', 'https_proxy', 'HTTPS_PROXY'):
+            os.environ.pop(name, None)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def test_timeout(self):
+        async def get(url):
+            with pytest.raises(socket.timeout):
+                await aio._http_get(url + 'slow', 0.1)
+
+        serve(lambda line: None, get)
+
+    def test_redirect(self):
+        def respond(line):
+            if 'redirect' in line:
+                return b'HTTP/1.1 302 Found\r\nLocation: /a\r\nContent-Length: 0\r\n\r\n'
+            return ok(line.split(' ')[1])
+
+        body, requests = serve(respond, lambda url: aio._http_get(url + 'redirect', 5))
+        assert(body == b'/a')
+        assert(len(requests) == 2)
+
+    def test_proxy(self):
+        async def get(url):
+            os.environ['http_proxy'] = url.replace('//', '//user:secret@')
+            return await aio._http_get('http://api.openkvk.invalid/py/SELECT%201', 5)
+
+        body, requests = serve(lambda line: ok(line.split(' ')[1]), get)
+        assert(body == b'http://api.openkvk.invalid/py/SELECT%201')
+
+    def test_https_proxy_tunnel(self):
+        async def get(url):
+            os.environ['https_proxy'] = url
+            with pytest.raises(HTTPError) as error:
+                await aio._http_get('https://api.openkvk.invalid/py/SELECT%201', 5)
+            return error.value.code
+
+        code, requests = serve(lambda line: b'HTTP/1.1 407 Proxy Authentication Required\r\n\r\n', get)
+        assert(code == 407)
+        assert(requests == ['CONNECT api.openkvk.invalid:443 HTTP/1.1'])
+
+
+class TestAsyncApiClient(unittest.TestCase):
+    def test_get_by_city_over_http(self):
+        requests = []
+
+        async def handle(reader, writer):
+            line = await reader.readline()
+            requests.append(line.decode('latin-1'))
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            body = page(len(requests)).encode('utf-8')
+            writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n')
+            writer.write('{0:x}\r\n'.format(len(body)).encode('latin-1') + body + b'\r\n0\r\n\r\n')
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            client = AsyncApiClient()
+            client.BASE_URL = 'http://127.0.0.1:{0}/'.format(port)
+            try:
+                return await client.get_by_city('Utrecht', limit=150)
+            finally:
+                server.close()
+
+        result = asyncio.run(run())
+        assert(sorted(row['offset'] for row in result) == [1, 2])
+        assert(all(line.startswith('GET /py/SELECT%20*%20FROM%20kvk') for line in requests))
+
+    def test_get_many_by_kvk(self):
+        async def request(query):
+            kvks = [int(kvk) for kvk in re.search(r'IN \(([^)]*)\)', query).group(1).split(',')]
+            # 1 has two establishments, 3 does not exist
+            rows = [[kvk, kvk * 10] for kvk in kvks if kvk != 3] + [[1, 11]]
+            return '[{{"RESULT":{{"TYPES":["int","int"],"HEADER":["kvks","vestiging"],"ROWS":{0}}}}}]'.format(rows)
+
+        client = AsyncApiClient()
+        client.request = request
+        found, missing = asyncio.run(client.get_many_by_kvk([1, 2, '3', 2], fields=['vestiging']))
+        assert(sorted(found) == [1, 2])
+        assert(found[1]['vestiging'] == 10)
+        assert(missing == set([3]))
+
+    def test_get_by_sbi_many(self):
+        companies = {'6201': [1, 2], '6202': [2, 3]}
+
+        async def request(query):
+            code = re.search(r"code = '(\d+)'", query).group(1)
+            rows = [[kvk] for kvk in companies[code]]
+            return '[{{"RESULT":{{"TYPES":["int"],"HEADER":["kvks"],"ROWS":{0}}}}}]'.format(rows)
+
+        async def collect(client):
+            return [row['kvks'] async for row in client.iter_by_sbi([6201, '6202'])]
+
+        client = AsyncApiClient()
+        client.request = request
+        result = asyncio.run(client.get_by_sbi([6201, '6202'], limit=None, fields=['kvks']))
+        assert(sorted(row['kvks'] for row in result) == [1, 2, 3])
+        assert(sorted(asyncio.run(collect(client))) == [1, 2, 3])
+        assert(len(asyncio.run(client.get_by_sbi(['6201', '6202'], limit=2))) == 2)
+
+    def test_get_by_sbi_many_failure(self):
+        async def request(query):
+            if '6202' in query:
+                raise IOError('page failed')
+            await asyncio.sleep(0.01)
+            return '[{"RESULT":{"TYPES":["int"],"HEADER":["kvks"],"ROWS":[[1]]}}]'
+
+        client = AsyncApiClient()
+        client.request = request
+        with pytest.raises(IOError):
+            asyncio.run(client.get_by_sbi(['6201', '6202']))
@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+import time
+import unittest
+
+from OpenKVK import BaseClient
+from OpenKVK.cache import MemoryCache, FileCache
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', '1')
+        cache.set('b', '2')
+        assert(cache.get('a') == '1')
+        cache.set('c', '3')
+        assert(cache.get('b') is None)
+        assert(cache.get('a') == '1')
+        assert(cache.get('c') == '3')
+        assert(len(cache) == 2)
+        assert(cache.stats() == {'hits': 3, 'misses': 1})
+
+    def test_ttl(self):
+        cache = MemoryCache(ttl=0.01)
+        cache.set('a', '1')
+        time.sleep(0.02)
+        assert(cache.get('a') is None)
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_persistent(self):
+        FileCache(self.dir).set('py:SELECT 1', u'[{"RESULT": 1}]')
+        cache = FileCache(self.dir)
+        assert(cache.get('py:SELECT 1') == u'[{"RESULT": 1}]')
+        assert(cache.get('py:SELECT 2') is None)
+        cache.clear()
+        assert(cache.get('py:SELECT 1') is None)
+
+    def test_ttl(self):
+        cache = FileCache(self.dir, ttl=-1)
+        cache.set('a', '1')
+        assert(cache.get('a') is None)
+
+
+class TestClientCache(unittest.TestCase):
+    def test_request_uses_cache(self):
+        client = BaseClient(cache=MemoryCache())
+        client.cache.set(client._cache_key("SELECT * FROM kvk WHERE plaats = 'Den  Haag'"), 'cached')
+        assert(client.request("SELECT  *\nFROM kvk WHERE plaats = \"Den  Haag\";") == 'cached')
+        assert(client._cache_key("SELECT * FROM kvk WHERE plaats = 'Den Haag'") != client._cache_key("SELECT * FROM kvk WHERE plaats = 'Den  Haag'"))
+        client.setResponseFormat('json')
+        assert(client._cache_key("SELECT 1") == 'json:SELECT 1')
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from OpenKVK import ApiClient
+from OpenKVK import cli
+
+
+class FakeClient(ApiClient):
+    def get_many_by_kvk(self, kvks, fields='*'):
+        kvks = [int(kvk) for kvk in kvks]
+        return dict((kvk, {"kvks": kvk, "bedrijfsnaam": u"Café {0} B.V.".format(kvk)}) for kvk in kvks if kvk % 2), set(kvk for kvk in kvks if not kvk % 2)
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.input = os.path.join(self.dir, 'kvks.txt')
+        self.output = os.path.join(self.dir, 'out')
+        with open(self.input, 'w') as f:
+            f.write("\n".join(str(kvk) for kvk in range(250)) + "\n\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_batch_ndjson(self):
+        args = cli.parser.parse_args(['--input', self.input, '--output', self.output, '--format', 'json', '--workers', '3'])
+        cli.batch(args, FakeClient())
+        with open(self.output) as f:
+            rows = [json.loads(line) for line in f]
+        assert(sorted(row['kvks'] for row in rows) == list(range(1, 250, 2)))
+
+    def test_batch_csv(self):
+        args = cli.parser.parse_args(['--input', self.input, '--output', self.output])
+        cli.batch(args, FakeClient())
+        with open(self.output) as f:
+            lines = f.read().splitlines()
+        assert(lines[0] == 'bedrijfsnaam,kvks')
+        assert(len(lines) == 126)
+        assert(sorted(lines[1:])[0] == 'Café 1 B.V.,1')
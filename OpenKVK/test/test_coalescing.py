@@ -0,0 +1,83 @@
+import threading
+import time
+import unittest
+
+import pytest
+
+from OpenKVK import BaseClient
+from OpenKVK.transport import SingleFlight
+
+
+class SlowPool(object):
+    def __init__(self):
+        self.urls = []
+
+    def urlopen(self, url):
+        self.urls.append(url)
+        time.sleep(0.05)
+        if url.endswith('fail'):
+            raise IOError('failed')
+        return url.encode('utf-8')
+
+
+def run_concurrently(func, count):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(func())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_errors_are_shared(self):
+        group = SingleFlight()
+
+        def fail():
+            time.sleep(0.05)
+            raise IOError('failed')
+
+        results, errors = run_concurrently(lambda: group.do('key', fail), 4)
+        assert(len(errors) == 4 and results == [])
+        assert(group.stats() == {'calls': 1, 'coalesced': 3})
+        with pytest.raises(ValueError):
+            group.do('key', lambda: int('x'))
+        assert(group.do('key', lambda: 1) == (1, False))
+
+
+class TestClientCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.pool = SlowPool()
+        self.single_flight = BaseClient.SINGLE_FLIGHT
+        BaseClient.SINGLE_FLIGHT = SingleFlight()
+
+    def tearDown(self):
+        BaseClient.SINGLE_FLIGHT = self.single_flight
+
+    def client(self, coalesce=True):
+        client = BaseClient(coalesce=coalesce)
+        client.CONNECTION_POOL = self.pool
+        return client
+
+    def test_identical_requests_are_coalesced(self):
+        results, errors = run_concurrently(lambda: self.client().request("SELECT * FROM kvk WHERE kvks = 1"), 5)
+        assert(len(self.pool.urls) == 1)
+        assert(len(set(results)) == 1 and len(results) == 5)
+
+    def test_different_requests(self):
+        client = self.client()
+        run_concurrently(lambda: client.request("SELECT {0}".format(threading.current_thread().name)), 3)
+        assert(len(self.pool.urls) == 3)
+
+    def test_disabled(self):
+        run_concurrently(lambda: self.client(coalesce=False).request("SELECT 1"), 3)
+        assert(len(self.pool.urls) == 3)
@@ -0,0 +1,68 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from OpenKVK import ApiClient
+from OpenKVK.feed import BankruptcyFeed
+
+
+class FakeApi(ApiClient):
+    """ApiClient serving keyset paginated pages of the fallissementen table from memory"""
+    HEADER = ["kvks", "bedrijfsnaam", "plaats", "datum"]
+
+    def __init__(self, rows):
+        ApiClient.__init__(self, onlyActiveCompanies=False)
+        self.rows = rows
+        self.requested = []
+
+    def request(self, query):
+        self.requested.append(query)
+        rows = [row for row in self.rows if row[2] == re.search(r"plaats ILIKE '%(\w+)%'", query).group(1)]
+        match = re.search(r"\(datum > '([\d-]+)'\) OR \(datum = '[\d-]+' AND kvks > (-?\d+)\)", query)
+        if match:
+            after = (match.group(1), int(match.group(2)))
+            rows = [row for row in rows if (row[3], row[0]) > after]
+        rows = sorted(rows, key=lambda row: (row[3], row[0]))[:int(re.search(r'LIMIT (\d+)', query).group(1))]
+        return json.dumps([{"RESULT": {"HEADER": self.HEADER, "ROWS": rows}}])
+
+
+class TestBankruptcyFeed(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state = os.path.join(self.directory, 'feed.json')
+        rows = [[100 + i, "Bedrijf {0}".format(i), "Utrecht", "2015-01-{0:02d}".format(1 + i % 28)] for i in range(120)]
+        self.api = FakeApi(rows + [[999, "Elders", "Zeist", "2015-02-01"]])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_poll(self):
+        feed = BankruptcyFeed(self.state, client=self.api, plaats="Utrecht")
+        assert(feed.high_water_mark() is None)
+        assert(len(feed.poll()) == 120)
+        assert(feed.high_water_mark() == ("2015-01-28", 211))
+
+        del self.api.requested[:]
+        assert(feed.poll() == [])
+        assert(len(self.api.requested) == 1 and "ORDER BY datum, kvks LIMIT 99;" in self.api.requested[0])
+
+        self.api.rows.append([500, "Nieuw", "Utrecht", "2015-03-01"])
+        self.api.rows.append([501, "Nieuw", "Zeist", "2015-03-01"])
+        restarted = BankruptcyFeed(self.state, client=self.api, plaats="Utrecht")
+        assert([event["kvks"] for event in restarted.poll()] == [500])
+
+    def test_state_per_feed(self):
+        utrecht = BankruptcyFeed(self.state, client=self.api, plaats="Utrecht")
+        zeist = BankruptcyFeed(self.state, client=self.api, fields=["bedrijfsnaam"], plaats="Zeist")
+        assert(zeist.poll() == [{"kvks": 999, "bedrijfsnaam": "Elders", "plaats": "Zeist", "datum": "2015-02-01"}])
+        assert(len(utrecht.poll(limit=10)) == 10)
+        assert(utrecht.high_water_mark() == ("2015-01-02", 213))
+        assert(zeist.high_water_mark() == ("2015-02-01", 999))
+        assert("SELECT bedrijfsnaam,datum,kvks FROM fallissementen" in zeist.query)
+
+    def test_since(self):
+        feed = BankruptcyFeed(self.state, client=self.api, since="2015-01-28", plaats="Utrecht")
+        assert([event["kvks"] for event in feed.poll()] == [127, 155, 183, 211])
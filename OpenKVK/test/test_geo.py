@@ -0,0 +1,39 @@
+import math
+import random
+import unittest
+
+from OpenKVK.geo import SpatialIndex, distance
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(4)
+        self.points = [(math.radians(rnd.uniform(51.9, 52.2)), math.radians(rnd.uniform(4.9, 5.3)), i) for i in range(2000)]
+        self.index = SpatialIndex(cell=500)
+        for lat, lon, i in self.points:
+            self.index.add(lat, lon, i)
+        self.lat, self.lon = math.radians(52.09), math.radians(5.12)
+
+    def brute_force(self, radius=None):
+        found = sorted((distance(self.lat, self.lon, lat, lon), i) for lat, lon, i in self.points)
+        return [(d, i) for d, i in found if radius is None or d <= radius]
+
+    def test_distance(self):
+        # Utrecht Dom - Amsterdam Dam, about 35 km
+        d = distance(math.radians(52.0907), math.radians(5.1214), math.radians(52.3731), math.radians(4.8926))
+        assert(34000 < d < 36000)
+
+    def test_within(self):
+        for radius in (0, 250, 2000, 10000):
+            assert(self.index.within(self.lat, self.lon, radius) == self.brute_force(radius))
+
+    def test_nearest(self):
+        assert(len(self.index) == 2000)
+        assert(self.index.k_nearest(self.lat, self.lon, 25) == self.brute_force()[:25])
+        assert(list(self.index.nearest(self.lat, self.lon)) == self.brute_force())
+        far = math.radians(53.5)
+        assert([i for d, i in self.index.k_nearest(far, self.lon, 5)] ==
+               [i for d, i in sorted((distance(far, self.lon, lat, lon), i) for lat, lon, i in self.points)[:5]])
+
+    def test_empty(self):
+        assert(SpatialIndex().within(self.lat, self.lon, 1000) == [])
@@ -0,0 +1,57 @@
+import re
+import socket
+import unittest
+
+from OpenKVK import QueryBuilder
+from OpenKVK.instrument import RecordingObserver
+from OpenKVK.resilience import RetryPolicy
+
+
+class PagePool(object):
+    """Connection pool serving 250 rows, the first request times out"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def urlopen(self, url, timings=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise socket.timeout()
+        offset = int(re.search(r'OFFSET%20(\d+)', url).group(1))
+        size = int(re.search(r'LIMIT%20(\d+)', url).group(1))
+        rows = ",".join("[{0}]".format(i) for i in range(offset, min(offset + size, 250)))
+        body = ('[{"RESULT":{"TYPES":["int"],"HEADER":["kvks"],"ROWS":[' + rows + ']}}]').encode('utf-8')
+        if timings is not None:
+            timings.update(reused=True, connect=0.0, wait=0.0, download=0.0, bytes=len(body))
+        return body
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.observer = RecordingObserver()
+        self.client = QueryBuilder(onlyActiveCompanies=False, observers=[self.observer],
+                                   retry=RetryPolicy(retries=1, backoff=0))
+        self.client.CONNECTION_POOL = PagePool()
+
+    def test_do_query(self):
+        self.client.setWorkers(3)
+        assert(len(self.client.do_query("SELECT kvks FROM kvk", 297)) == 250)
+        assert(len(self.observer.requests) == 3)
+        assert(all(event['seconds'] >= 0 and event['bytes'] > 0 and event['error'] is None for event in self.observer.requests))
+        assert(sorted(event['attempts'] for event in self.observer.requests) == [1, 1, 2])
+        assert(sorted(event['stage'] for event in self.observer.parses) == ['decode'] * 3 + ['parse', 'pythonify'])
+
+        summary = self.observer.queries[0]
+        assert(len(self.observer.queries) == 1)
+        assert(summary['query'] == "SELECT kvks FROM kvk")
+        assert((summary['pages'], summary['rows'], summary['retries'], summary['cache_hits']) == (3, 250, 1, 0))
+
+    def test_do_iter_query(self):
+        assert(len(list(self.client.do_iter_query("SELECT kvks FROM kvk", 1000))) == 250)
+        summary = self.observer.queries[0]
+        assert((summary['pages'], summary['rows'], summary['retries']) == (3, 250, 1))
+
+    def test_remove_observer(self):
+        self.client.removeObserver(self.observer)
+        self.client.do_query("SELECT kvks FROM kvk", 10)
+        assert(self.observer.requests == [] and self.observer.queries == [])
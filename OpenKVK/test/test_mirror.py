@@ -0,0 +1,106 @@
+import json
+import math
+import re
+import unittest
+
+from OpenKVK import QueryBuilder
+from OpenKVK.mirror import Mirror, MirrorClient
+
+
+class FakeApi(QueryBuilder):
+    """QueryBuilder serving keyset paginated pages of the kvk table from memory"""
+    HEADER = ["kvk", "kvks", "bedrijfsnaam", "plaats", "status"]
+
+    def __init__(self, rows):
+        QueryBuilder.__init__(self, onlyActiveCompanies=False)
+        self.rows = rows
+        self.requested = []
+
+    def request(self, query):
+        self.requested.append(query)
+        match = re.search(r'\(kvk > (\d+)\)', query)
+        after = int(match.group(1)) if match else -1
+        limit = int(re.search(r'LIMIT (\d+)', query).group(1))
+        rows = [row for row in self.rows if row[0] > after][:limit]
+        return json.dumps([{"RESULT": {"HEADER": self.HEADER, "ROWS": rows}}])
+
+
+class TestMirror(unittest.TestCase):
+    def setUp(self):
+        rows = [[i, 10000 + i, "Bedrijf {0}".format(i), "Utrecht" if i % 2 else "Zeist", None] for i in range(150)]
+        rows[3][4] = "Opgeheven"
+        self.api = FakeApi(rows)
+        self.mirror = Mirror(':memory:', client=self.api)
+
+    def test_sync(self):
+        assert(self.mirror.sync('kvk') == 150)
+        assert(len(self.api.requested) == 2)
+        assert(self.mirror.high_water_mark('kvk') == (149,))
+
+        self.api.rows.append([150, 10150, "Nieuw", "Utrecht", None])
+        del self.api.requested[:]
+        assert(self.mirror.sync('kvk') == 1)
+        assert(self.api.requested == ["SELECT * FROM kvk WHERE (1 = 1) AND (kvk > 149) ORDER BY kvk LIMIT 99;"])
+        assert(self.mirror.select("SELECT COUNT(*) FROM kvk")['ROWS'] == [[151]])
+
+    def test_sync_full(self):
+        self.mirror.sync('kvk')
+        self.api.rows[10][2] = "Hernoemd"
+        self.api.rows.insert(20, [19.5, 10019, "Nieuwe vestiging", "Utrecht", None])
+        assert(self.mirror.sync('kvk') == 0)
+        assert(self.mirror.select("SELECT bedrijfsnaam FROM kvk WHERE kvk = 10")['ROWS'] == [["Bedrijf 10"]])
+
+        assert(self.mirror.sync('kvk', full=True) == 151)
+        assert(self.mirror.select("SELECT bedrijfsnaam FROM kvk WHERE kvk = 10")['ROWS'] == [["Hernoemd"]])
+        assert(self.mirror.select("SELECT COUNT(*) FROM kvk")['ROWS'] == [[151]])
+        assert(self.mirror.high_water_mark('kvk') == (149,))
+
+    def test_sync_bankruptcies_by_date(self):
+        del self.api.rows[:]
+        assert(self.mirror.sync('fallissementen') == 0)
+        assert(self.api.requested == ["SELECT * FROM fallissementen WHERE 1 = 1 ORDER BY datum, kvks LIMIT 99;"])
+
+    def test_mirror_client(self):
+        self.mirror.sync('kvk')
+        client = MirrorClient(self.mirror)
+        assert(client.get_by_kvk(10001) == [{"kvk": 1, "kvks": 10001, "bedrijfsnaam": "Bedrijf 1", "plaats": "Utrecht", "status": None}])
+        assert(client.get_by_kvk(10003) == [])
+        assert(len(client.get_by_city("utrecht", limit=None)) == 74)
+        client.setResponseFormat('json')
+        assert(client.get_by_city("zeist", limit=1, fields=["bedrijfsnaam"]) == '[{"bedrijfsnaam": "Bedrijf 0"}]')
+
+    def test_get_nearby(self):
+        header = ["kvk", "kvks", "bedrijfsnaam", "status", "lat_rad", "lon_rad"]
+        self.mirror._create_table('kvk', header)
+        rows = [[i, 10000 + i, "Bedrijf {0}".format(i), "Opgeheven" if i == 1 else None,
+                 math.radians(52.09 + i * 0.001), math.radians(5.12)] for i in range(10)]
+        rows.append([10, 10010, "Zonder locatie", None, None, None])
+        self.mirror.connection.executemany("INSERT INTO kvk VALUES (?, ?, ?, ?, ?, ?)", rows)
+        client = MirrorClient(self.mirror)
+        assert([row["kvk"] for row in client.get_nearby(52.0921, 5.12, radius=300)] == [2, 3, 4, 0])
+        assert([row["kvk"] for row in client.get_nearby(52.0921, 5.12, radius=None, limit=3)] == [2, 3, 4])
+        client.setActiveOnly(False)
+        assert([row["kvk"] for row in client.get_nearby(52.09, 5.12, radius=150, fields=["kvk"])] == [0, 1])
+        assert(client.get_nearby(52.5, 5.12, radius=100) == [])
+        assert(len(client.get_nearby(52.09, 5.12, radius=None, limit=None)) == 10)
+
+    def test_get_by_name(self):
+        self.mirror.sync('kvk')
+        client = MirrorClient(self.mirror)
+        assert([row["kvk"] for row in client.get_by_name("bedrijf 1", limit=3)] == [1, 10, 11])
+        assert([row["kvk"] for row in client.get_by_name("BEDRIJF 3", limit=3, plaats="Utrecht")] == [31, 33, 35])
+        assert(len(client.get_by_name("bedrijf", limit=None)) == 149)
+        assert(client.get_by_name("onbekend") == [])
+
+    def test_get_by_sbi(self):
+        self.mirror.sync('kvk')
+        self.mirror.connection.execute('CREATE TABLE kvk_sbi ("kvk", "code")')
+        self.mirror.connection.executemany("INSERT INTO kvk_sbi VALUES (?, ?)",
+                                           [(1, "62.01"), (1, "62.02"), (2, "62.02"), (4, "47.11")])
+        client = MirrorClient(self.mirror)
+        assert([row["kvk"] for row in client.get_by_sbi("62.02")] == [1, 2])
+        assert([row["kvk"] for row in client.get_by_sbi("62*")] == [1, 2])
+        assert([row["kvk"] for row in client.get_by_sbi(["62.01", "47.11"])] == [1, 4])
+        self.mirror.connection.execute("INSERT INTO kvk_sbi VALUES (5, '6420')")
+        assert([row["kvk"] for row in client.get_by_sbi(6420)] == [5])
+        assert([row["kvk"] for row in client.get_by_sbi(["62.01", 6420])] == [1, 5])
@@ -1,7 +1,13 @@
 from OpenKVK import BaseClient, QueryBuilder, ApiClient
+import OpenKVK
 import pytest
 import unittest
+import io
+import json
 import os
+import re
+import time
+import warnings
 
 
 class TestBaseClient(unittest.TestCase):
@@ -64,6 +70,73 @@ class TestQueryBuilder(unittest.TestCase):
         assert(self.client._parse_query_results(py_result) == [{"bedrijfsnaam": "Kinkrsoftware"}])
         # py - multiple queries
         assert(self.client._parse_query_results(py_multiple_query_result) == [{"bedrijfsnaam": "Friesland Bank N.V."},{"bedrijfsnaam": "Bineko-export B.V."},{"bedrijfsnaam": "Bytefabriek"}])
+        # py - python literal syntax
+        assert(self.client._parse_query_results(["[{'RESULT':{'TYPES':['varchar'],'HEADER':['website'],'ROWS':[[None]]}}]"]) == [{"website": None}])
+
+    def test_parse_query_results_compact(self):
+        py_multiple_query_result = ['[{"RESULT":{"TYPES":["varchar"],"HEADER":["bedrijfsnaam"],"ROWS":[["Friesland Bank N.V."]]}}]', '[{"RESULT":{"TYPES":["varchar"],"HEADER":["bedrijfsnaam"],"ROWS":[["Bineko-export B.V."],["Bytefabriek"]]}}]']
+        self.client.setResponseFormat('py')
+        self.client.setCompact(True)
+        result = self.client._parse_query_results(py_multiple_query_result)
+        assert(result.header == ["bedrijfsnaam"])
+        assert([row["bedrijfsnaam"] for row in result] == ["Friesland Bank N.V.", "Bineko-export B.V.", "Bytefabriek"])
+        assert(result.to_dicts() == [{"bedrijfsnaam": "Friesland Bank N.V."},{"bedrijfsnaam": "Bineko-export B.V."},{"bedrijfsnaam": "Bytefabriek"}])
+
+    def test_parse_query_results_columnar(self):
+        pages = ['[{"RESULT":{"TYPES":["int","varchar"],"HEADER":["kvks","bedrijfsnaam"],"ROWS":[[1,"Friesland Bank N.V."]]}}]',
+                 '[{"RESULT":{"TYPES":["int","varchar"],"HEADER":["kvks","bedrijfsnaam"],"ROWS":[["2","Bytefabriek"]]}}]']
+        self.client.setResponseFormat('py')
+        self.client.setColumnar(True)
+        result = self.client._parse_query_results(pages)
+        assert(result.header == ["kvks", "bedrijfsnaam"] and len(result) == 2)
+        assert(result["kvks"] == [1, 2])
+        assert(len(self.client._parse_query_results([])) == 0)
+        with pytest.raises(TypeError):
+            self.client.setColumnar(1)
+
+    def test_parse_query_results_processes(self):
+        response_buffer = ['[{"RESULT":{"TYPES":["int","varchar"],"HEADER":["kvks","bedrijfsnaam"],"ROWS":[[%d,"B\u00e9 %d"],["%d","x"]]}}]' % (i, i, i + 1) for i in range(0, 20, 2)]
+        response_buffer.append('[{"RESULT":{"TYPES":["int","varchar"],"HEADER":["kvks","bedrijfsnaam"],"ROWS":[]}}]')
+        self.client.setResponseFormat('py')
+        expected = self.client._parse_query_results(response_buffer)
+        self.client.setProcesses(2)
+        # small results are decoded in the calling thread
+        OpenKVK.shutdown_process_pools()
+        assert(self.client._parse_query_results(response_buffer) == expected)
+        assert(OpenKVK.Client._process_pools == {})
+        self.client.PARALLEL_PAGES = 2
+        assert(self.client._parse_query_results(response_buffer) == expected)
+        assert(OpenKVK.Client._process_pools != {})
+        assert([row["kvks"] for row in expected][:3] == [0, "1", 2])
+        self.client.setCompact(True)
+        assert(self.client._parse_query_results(response_buffer).rows == [tuple(row.values()) for row in expected])
+        self.client.setCompact(False)
+        self.client.setColumnar(True)
+        assert(self.client._parse_query_results(response_buffer)["kvks"] == list(range(20)))
+        self.client.setColumnar(False)
+        self.client.setResponseFormat('json')
+        self.client.setProcesses(1)
+        expected = self.client._parse_query_results(response_buffer)
+        self.client.setProcesses(2)
+        assert(self.client._parse_query_results(response_buffer) == expected)
+        with pytest.raises(ValueError):
+            self.client.setProcesses(0)
+        with pytest.raises(TypeError):
+            self.client.setProcesses(2.0)
+
+    def test_shutdown_process_pools(self):
+        pool = OpenKVK.Client._process_pool(2)
+        if hasattr(pool,'_ctx'):
+            assert(pool._ctx.get_start_method() in ('forkserver','spawn'))
+        OpenKVK.shutdown_process_pools()
+        assert(OpenKVK.Client._process_pools == {})
+        with pytest.raises(ValueError):
+            pool.apply(len,([],))
+        # a new pool is started on the next parallel decode
+        self.client.setProcesses(2)
+        self.client.PARALLEL_PAGES = 2
+        assert(len(self.client._parse_query_results(['[{"RESULT":{"HEADER":["kvks"],"ROWS":[[1]]}}]'] * 2)) == 2)
+        assert(OpenKVK.Client._process_pools != {})
 
     def test_parse_query_results_csv(self):
         csv_result = ['"bedrijfsnaam"\n"Kinkrsoftware"\n']
@@ -74,10 +147,146 @@ class TestQueryBuilder(unittest.TestCase):
         assert(self.client._parse_query_results(csv_result) == 'bedrijfsnaam\nKinkrsoftware')
         # CSV - multiple queries
         assert(self.client._parse_query_results(csv_multiple_query_result) == 'bedrijfsnaam\nFriesland Bank N.V.\nBineko-export B.V.\nBytefabriek')
+        # CSV - quoted values
+        csv_quoted_result = ['"bedrijfsnaam","plaats"\n"Foo, Bar B.V.","Den ""Haag"""\n', '"bedrijfsnaam","plaats"\n"Baz","Utrecht"\n']
+        assert(self.client._parse_query_results(csv_quoted_result) == 'bedrijfsnaam,plaats\n"Foo, Bar B.V.","Den ""Haag"""\nBaz,Utrecht')
+
+    def test_do_csv_query(self):
+        self.client.setResponseFormat('py')
+        self.client.request = lambda query: '[{"RESULT":{"TYPES":["varchar","varchar"],"HEADER":["bedrijfsnaam","website"],"ROWS":[["Foo, Bar B.V.",null]]}}]'
+        target = io.StringIO()
+        assert(self.client.do_csv_query("x", 500, target) == 1)
+        assert(target.getvalue() == 'bedrijfsnaam,website\n"Foo, Bar B.V.",\n')
 
     def test__do_query(self):
         pass
 
+    def test__do_query_concurrent(self):
+        self.client.setResponseFormat('py')
+        self.client.setWorkers(4)
+        page = '[{{"RESULT":{{"TYPES":["int"],"HEADER":["offset"],"ROWS":[[{0}]]}}}}]'
+
+        def request(query):
+            time.sleep(0.01 if 'OFFSET 0;' in query else 0)
+            return page.format(int(query.rstrip(';').split(' ')[-1]))
+
+        self.client.request = request
+        result = self.client.do_query("x", 500)
+        assert([row['offset'] for row in result] == [0, 99, 198, 297, 396, 495])
+
+    def test__do_query_concurrent_failure(self):
+        self.client.setWorkers(2)
+        requested = []
+
+        def request(query):
+            requested.append(query)
+            raise IOError('page failed')
+
+        self.client.request = request
+        with pytest.raises(IOError):
+            self.client.do_query("x", 5000)
+        assert(len(requested) <= 2)
+
+    def test_do_iter_query(self):
+        self.client.setResponseFormat('json')
+        requested = []
+
+        def request(query):
+            requested.append(query)
+            rows = ",".join(['["x"]'] * (99 if len(requested) == 1 else 3))
+            return '[{"RESULT":{"TYPES":["varchar"],"HEADER":["bedrijfsnaam"],"ROWS":[' + rows + ']}}]'
+
+        self.client.request = request
+        rows = self.client.do_iter_query("x", 1000)
+        assert(requested == [])
+        assert(next(rows) == {"bedrijfsnaam": "x"})
+        assert(len(requested) == 1)
+        assert(len(list(rows)) == 101)
+        assert(len(requested) == 2)
+
+    def test_iter_query_csv(self):
+        self.client.setResponseFormat('csv')
+        self.client.request = lambda query: '"bedrijfsnaam","plaats"\n"Foo, Bar B.V.","Utrecht"\n'
+        assert(list(self.client.iter_query("SELECT * FROM kvk LIMIT 5")) == [{"bedrijfsnaam": "Foo, Bar B.V.", "plaats": "Utrecht"}])
+
+    def test__keyset_query(self):
+        assert(self.client._keyset_query("SELECT * FROM kvk", ("kvks",), None, 99) == "SELECT * FROM kvk ORDER BY kvks LIMIT 99;")
+        assert(self.client._keyset_query("SELECT * FROM kvk WHERE plaats = 'x'", ("kvks",), (5,), 99) == "SELECT * FROM kvk WHERE (plaats = 'x') AND (kvks > 5) ORDER BY kvks LIMIT 99;")
+        assert(self.client._keyset_query("x WHERE y", ("kvk", "code"), (5, "O'Neil"), 10) == "x WHERE (y) AND ((kvk > 5) OR (kvk = 5 AND code > 'O''Neil')) ORDER BY kvk, code LIMIT 10;")
+        assert(self.client._keyset_query("SELECT * FROM kvk WHERE plaats = 'a' OR plaats = 'b';", ("kvk",), (5,), 99) ==
+               "SELECT * FROM kvk WHERE (plaats = 'a' OR plaats = 'b') AND (kvk > 5) ORDER BY kvk LIMIT 99;")
+        assert(self.client._keyset_query("SELECT * FROM kvk WHERE bedrijfsnaam = 'order by limit'", ("kvk",), None, 99) ==
+               "SELECT * FROM kvk WHERE bedrijfsnaam = 'order by limit' ORDER BY kvk LIMIT 99;")
+        for query in ("SELECT * FROM kvk ORDER BY plaats", "SELECT * FROM kvk WHERE plaats = 'x' LIMIT 10"):
+            with pytest.raises(ValueError):
+                self.client._keyset_query(query, ("kvk",), None, 99)
+
+    def test_keyset_warns_for_non_unique_column(self):
+        with pytest.warns(UserWarning):
+            self.client.setKeysetPagination('kvks')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.client.setKeysetPagination('kvk')
+            self.client.setKeysetPagination(('kvks', 'sub'))
+
+    def test_do_query_keyset(self):
+        self.client.setKeysetPagination('kvk')
+        requested = []
+
+        def request(query):
+            requested.append(query)
+            match = re.search(r'kvk > (\d+)', query)
+            start = int(match.group(1)) + 1 if match else 0
+            size = int(re.search(r'LIMIT (\d+)', query).group(1))
+            rows = ",".join("[{0}]".format(kvk) for kvk in range(start, min(start + size, 150)))
+            return '[{"RESULT":{"TYPES":["int"],"HEADER":["kvk"],"ROWS":[' + rows + ']}}]'
+
+        self.client.request = request
+        result = self.client.do_query("SELECT kvk FROM kvk WHERE plaats = 'x'", 500)
+        assert([row['kvk'] for row in result] == list(range(150)))
+        assert(len(requested) == 2)
+        assert(requested[1].endswith("AND (kvk > 98) ORDER BY kvk LIMIT 99;"))
+        assert(len(self.client.do_query("SELECT kvk FROM kvk WHERE plaats = 'x'", 120)) == 120)
+
+    def test__count_query(self):
+        assert(self.client._count_query("SELECT bedrijfsnaam, kvks FROM kvk WHERE plaats = 'x'") == "SELECT COUNT(*) FROM kvk WHERE plaats = 'x';")
+
+    def offset_request(self, total, requested):
+        def request(query):
+            requested.append(query)
+            if 'COUNT(*)' in query:
+                return '[{"RESULT":{"TYPES":["bigint"],"HEADER":["count"],"ROWS":[[' + str(total) + ']]}}]'
+            offset = int(re.search(r'OFFSET (\d+)', query).group(1))
+            size = int(re.search(r'LIMIT (\d+)', query).group(1))
+            rows = ",".join("[{0}]".format(i) for i in range(offset, min(offset + size, total)))
+            return '[{"RESULT":{"TYPES":["int"],"HEADER":["kvks"],"ROWS":[' + rows + ']}}]'
+        return request
+
+    def test_do_query_stops_at_short_page(self):
+        requested = []
+        self.client.request = self.offset_request(150, requested)
+        assert(len(self.client.do_query("x", 10000)) == 150)
+        assert(len(requested) == 2)
+        assert(len(self.client.do_query("x", None)) == 150)
+
+    def test_do_query_planning(self):
+        requested = []
+        self.client.request = self.offset_request(250, requested)
+        self.client.setWorkers(4)
+        self.client.setQueryPlanning(True)
+        assert(len(self.client.do_query("SELECT kvks FROM kvk WHERE plaats = 'x'", 10000)) == 250)
+        assert(len(requested) == 4)
+        self.client.setQueryPlanning(False)
+        del requested[:]
+        assert([row['kvks'] for row in self.client.do_query("SELECT kvks FROM kvk WHERE plaats = 'x'", None)] == list(range(250)))
+        assert(len(requested) == 4)
+
+    def test_set_workers(self):
+        with pytest.raises(TypeError):
+            self.client.setWorkers('4')
+        with pytest.raises(ValueError):
+            self.client.setWorkers(0)
+
     def test_query(self):
         with pytest.raises(ValueError):
             self.client.query(1)
@@ -96,6 +305,105 @@ class TestApiClient(unittest.TestCase):
     def test_get_banktruptcies(self):
         with pytest.raises(KeyError):
             self.client.get_bankruptcies()
+        with pytest.raises(KeyError):
+            self.client.iter_bankruptcies()
+
+    def test_get_many_by_kvk(self):
+        requested = []
+
+        def request(query):
+            requested.append(query)
+            numbers = re.search(r'IN \((.*?)\)', query).group(1).split(',')
+            rows = ",".join('["{0}",{0}]'.format(kvk) for kvk in numbers if int(kvk) % 2 == 0)
+            return '[{"RESULT":{"TYPES":["varchar","int"],"HEADER":["bedrijfsnaam","kvks"],"ROWS":[' + rows + ']}}]'
+
+        self.client.request = request
+        self.client.setWorkers(4)
+        found, missing = self.client.get_many_by_kvk(list(range(250)) + ['2', 4], fields=['bedrijfsnaam'])
+        assert(len(requested) == 3)
+        assert(all('LIMIT 99 OFFSET 0' in query for query in requested))
+        assert(sorted(found) == list(range(0, 250, 2)))
+        assert(found[4] == {"bedrijfsnaam": "4", "kvks": 4})
+        assert(missing == set(range(1, 250, 2)))
+
+    def test_get_by_sbi_many(self):
+        requested = []
+        # companies 0-199 have code 62.01, the even ones also 62.02, 1000-1049 have 47.11
+        codes = {"62.01": range(200), "62.02": range(0, 200, 2), "47.11": range(1000, 1050)}
+
+        def request(query):
+            requested.append(query)
+            match = re.search(r"code (=|LIKE) '([^']*)'", query)
+            offset, limit = int(re.search(r'OFFSET (\d+)', query).group(1)), int(re.search(r'LIMIT (\d+)', query).group(1))
+            kvks = [kvk for code, numbers in sorted(codes.items()) if code == match.group(2) or
+                    (match.group(1) == 'LIKE' and code.startswith(match.group(2).rstrip('%'))) for kvk in numbers]
+            rows = ",".join('[{0},"{1}"]'.format(kvk, kvk % 7) for kvk in kvks[offset:offset + limit])
+            return '[{"RESULT":{"TYPES":["int","varchar"],"HEADER":["kvks","bedrijfsnaam"],"ROWS":[' + rows + ']}}]'
+
+        self.client.request = request
+        self.client.setResponseFormat('py')
+        self.client.setWorkers(3)
+        result = self.client.get_by_sbi(["62.01", "62.02", "47.11"], limit=None)
+        assert(sorted(row["kvks"] for row in result) == list(range(200)) + list(range(1000, 1050)))
+        assert(len(self.client.get_by_sbi(["62.01", "62.02"], limit=150)) == 150)
+        assert(len(self.client.get_by_sbi("62*", limit=None, fields=["bedrijfsnaam"])) == 200)
+        assert("code LIKE '62%'" in requested[-1] and requested[-1].startswith("SELECT bedrijfsnaam,kvks FROM"))
+
+        self.client.setWorkers(1)
+        rows = self.client.iter_by_sbi(["47.11", "62*"], limit=60)
+        assert([row["kvks"] for row in rows] == list(range(1000, 1050)) + list(range(10)))
+        self.client.setResponseFormat('json')
+        assert(self.client.get_by_sbi(["47.11"], limit=2) == '[{"kvks": 1000, "bedrijfsnaam": "6"}, {"kvks": 1001, "bedrijfsnaam": "0"}]')
+
+    def test_get_by_sbi_int_codes(self):
+        requested = []
+
+        def request(query):
+            requested.append(query)
+            return '[{"RESULT":{"TYPES":["int"],"HEADER":["kvks"],"ROWS":[[1]]}}]'
+
+        self.client.request = request
+        self.client.setResponseFormat('py')
+        assert(self.client.get_by_sbi(6201) == [{"kvks": 1}])
+        assert("code = '6201'" in requested[-1])
+        assert(self.client.get_by_sbi(['62.01', 4711]) == [{"kvks": 1}])
+        assert("code = '4711'" in requested[-1])
+        assert(list(self.client.iter_by_sbi(4711)) == [{"kvks": 1}])
+
+    def test_get_by_sbi_many_error(self):
+        def request(query):
+            if "62.02" in query:
+                raise IOError("unavailable")
+            time.sleep(0.01)
+            return '[{"RESULT":{"TYPES":["int"],"HEADER":["kvks"],"ROWS":[[1]]}}]'
+
+        self.client.request = request
+        self.client.setWorkers(2)
+        with pytest.raises(IOError):
+            self.client.get_by_sbi(["62.01", "62.02", "62.03"])
+
+    def test_get_many_by_kvk_establishments(self):
+        def request(query):
+            numbers = re.search(r'IN \((.*?)\)', query).group(1).split(',')
+            offset = int(re.search(r'OFFSET (\d+)', query).group(1))
+            rows = [[int(kvk), sub] for kvk in numbers for sub in (0, 1)][offset:offset + 99]
+            return json.dumps([{"RESULT": {"TYPES": ["int", "int"], "HEADER": ["kvks", "sub"], "ROWS": rows}}])
+
+        self.client.request = request
+        self.client.setResponseFormat('py')
+        found, missing = self.client.get_many_by_kvk(range(99))
+        assert(sorted(found) == list(range(99)) and missing == set())
+
+    def test_iter_by_city(self):
+        requested = []
+
+        def request(query):
+            requested.append(query)
+            return '[{"RESULT":{"TYPES":["varchar"],"HEADER":["plaats"],"ROWS":[["Utrecht"]]}}]'
+
+        self.client.request = request
+        assert(list(self.client.iter_by_city("Utrecht", limit=500)) == [{"plaats": "Utrecht"}])
+        assert(requested == ["SELECT * FROM kvk WHERE plaats ILIKE '%Utrecht%' AND isnull(status) LIMIT 99 OFFSET 0;"])
 
 
 if __name__ =="__main__":
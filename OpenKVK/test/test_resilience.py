@@ -0,0 +1,87 @@
+import socket
+import time
+import unittest
+
+import pytest
+
+try:
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import HTTPError
+
+from OpenKVK import BaseClient
+from OpenKVK.resilience import CircuitBreaker, CircuitOpenError, RateLimiter, RetryPolicy
+
+
+class FakePool(object):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def urlopen(self, url):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return b'ok'
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rate(self):
+        limiter = RateLimiter(100, burst=1)
+        start = time.time()
+        for i in range(6):
+            limiter.acquire()
+        assert(time.time() - start >= 0.045)
+
+    def test_reserve(self):
+        limiter = RateLimiter(100, burst=2)
+        waits = [limiter.reserve() for i in range(4)]
+        assert(waits[:2] == [0.0, 0.0])
+        assert(0.005 < waits[2] <= 0.01 < waits[3] <= 0.02)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_is_transient(self):
+        policy = RetryPolicy()
+        assert(policy.is_transient(socket.timeout()))
+        assert(policy.is_transient(HTTPError('url', 503, 'Unavailable', {}, None)))
+        assert(not policy.is_transient(HTTPError('url', 400, 'Bad Request', {}, None)))
+        assert(not policy.is_transient(ValueError()))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=4)
+        assert(all(0 <= policy.delay(10) <= 4 for i in range(20)))
+        assert(policy.delay(0, HTTPError('url', 429, 'Too Many Requests', {'Retry-After': '3'}, None)) == 3)
+        # the async clients pass lowercase header names
+        assert(policy.delay(0, HTTPError('url', 503, 'Unavailable', {'retry-after': '2'}, None)) == 2)
+        assert(policy.delay(0, HTTPError('url', 503, 'Unavailable', None, None)) <= 1)
+
+
+class TestClientResilience(unittest.TestCase):
+    def setUp(self):
+        self.client = BaseClient()
+
+    def test_retry(self):
+        self.client.CONNECTION_POOL = FakePool([socket.timeout(), HTTPError('url', 502, 'Bad Gateway', {}, None)])
+        self.client.setRetryPolicy(RetryPolicy(retries=2, backoff=0))
+        assert(self.client.request("SELECT 1") == 'ok')
+        assert(self.client.CONNECTION_POOL.calls == 3)
+
+    def test_no_retry_for_client_errors(self):
+        self.client.CONNECTION_POOL = FakePool([HTTPError('url', 400, 'Bad Request', {}, None)])
+        self.client.setRetryPolicy(RetryPolicy(retries=2, backoff=0))
+        with pytest.raises(HTTPError):
+            self.client.request("SELECT 1")
+
+    def test_circuit_breaker(self):
+        self.client.CONNECTION_POOL = FakePool([socket.timeout()] * 2)
+        self.client.setCircuitBreaker(CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for i in range(2):
+            with pytest.raises(socket.timeout):
+                self.client.request("SELECT 1")
+        with pytest.raises(CircuitOpenError):
+            self.client.request("SELECT 1")
+        assert(self.client.CONNECTION_POOL.calls == 2)
+        self.client.breaker.opened_at -= 60
+        assert(self.client.request("SELECT 1") == 'ok')
+        assert(self.client.breaker.failures == 0)
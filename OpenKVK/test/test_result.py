@@ -0,0 +1,77 @@
+import unittest
+
+import pytest
+
+from OpenKVK.result import ColumnSet, ResultSet, record_type
+
+
+class TestResultSet(unittest.TestCase):
+    def setUp(self):
+        self.result = ResultSet(["kvks", "bedrijfsnaam"], [[1, "Foo"], [2, "Bar"]], ["int", "varchar"])
+
+    def test_record_access(self):
+        record = self.result[0]
+        assert(record["bedrijfsnaam"] == "Foo")
+        assert(record[0] == 1)
+        assert(record.get("plaats") is None)
+        assert("kvks" in record)
+        assert(record.keys() == ["kvks", "bedrijfsnaam"])
+        assert(record.items() == [("kvks", 1), ("bedrijfsnaam", "Foo")])
+        with pytest.raises(KeyError):
+            record["plaats"]
+
+    def test_header_is_shared(self):
+        assert(type(self.result[0]) is type(self.result[1]))
+        assert(record_type(["kvks", "bedrijfsnaam"]) is type(self.result[0]))
+        assert(not hasattr(self.result[0], '__dict__'))
+
+    def test_conversion(self):
+        assert(len(self.result) == 2)
+        assert(self.result.column("kvks") == [1, 2])
+        assert(self.result.to_dicts() == [{"kvks": 1, "bedrijfsnaam": "Foo"}, {"kvks": 2, "bedrijfsnaam": "Bar"}])
+
+    def test_to_columns(self):
+        columns = self.result.to_columns()
+        assert(columns.header == ["kvks", "bedrijfsnaam"] and len(columns) == 2)
+        assert(columns["bedrijfsnaam"] == ["Foo", "Bar"])
+        assert(columns.to_dicts() == self.result.to_dicts())
+
+
+class TestColumnSet(unittest.TestCase):
+    def test_types(self):
+        pages = [{'HEADER': ["kvks", "lat_rad", "anbi", "plaats"], 'TYPES': ["bigint", "double", "boolean", "varchar"],
+                  'ROWS': [[1, 0.9, True, "Utrecht"], ["2", "", "f", ""]]},
+                 {'HEADER': ["kvks", "lat_rad", "anbi", "plaats"], 'TYPES': ["bigint", "double", "boolean", "varchar"],
+                  'ROWS': [[3, 1, None, None]]}]
+        columns = ColumnSet.from_pages(pages)
+        assert(columns["kvks"] == [1, 2, 3])
+        assert(columns["lat_rad"] == [0.9, None, 1.0] and type(columns["lat_rad"][2]) is float)
+        assert(columns["anbi"] == [True, False, None])
+        assert(columns["plaats"] == ["Utrecht", "", None])
+        assert("anbi" in columns and len(columns) == 3)
+
+    def test_without_types(self):
+        columns = ColumnSet(["kvks"])
+        columns.extend([["1"], ["2"]])
+        assert(columns.column("kvks") == ["1", "2"])
+        assert(len(ColumnSet.from_pages([])) == 0)
+
+    def test_duplicate_header(self):
+        pages = [{'HEADER': ["kvk", "bedrijfsnaam", "kvk", "kvk_1", "code"], 'TYPES': ["int", "varchar", "int", "int", "varchar"],
+                  'ROWS': [[1, "Foo", 1, 9, "62.01"], [2, "Bar", 2, 9, "62.02"]]}]
+        columns = ColumnSet.from_pages(pages)
+        assert(columns.header == ["kvk", "bedrijfsnaam", "kvk_2", "kvk_1", "code"])
+        assert(len(columns) == 2)
+        assert(columns["kvk"] == [1, 2] and columns["kvk_2"] == [1, 2] and columns["kvk_1"] == [9, 9])
+        assert(columns.to_dicts()[0] == {"kvk": 1, "bedrijfsnaam": "Foo", "kvk_2": 1, "kvk_1": 9, "code": "62.01"})
+
+    def test_to_frame(self):
+        columns = ResultSet(["kvks", "bedrijfsnaam"], [[1, "Foo"], [2, "Bar"]], ["int", "varchar"]).to_columns()
+        try:
+            import pandas
+        except ImportError:
+            with pytest.raises(ImportError):
+                columns.to_frame()
+            return
+        frame = columns.to_frame()
+        assert(list(frame.columns) == ["kvks", "bedrijfsnaam"] and list(frame["kvks"]) == [1, 2])
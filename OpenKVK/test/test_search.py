@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+from OpenKVK.search import NameIndex, normalize
+
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex()
+        names = [u"Bakkerij de Korenschoof B.V.", u"Bakker", u"De Bakker", u"Zonnebakkerij", u"Café 't Hoekje",
+                 u"Hoek Installatietechniek", u"A", None]
+        for i, name in enumerate(names):
+            self.index.add(name, i)
+
+    def test_normalize(self):
+        assert(normalize(u"Café 't Hoekje B.V.") == u"cafe t hoekje b v")
+        assert(normalize(u"  ÉÉN--twee ") == u"een twee")
+
+    def test_ranking(self):
+        assert(self.index.search(u"bakker", limit=None) == [1, 0, 2, 3])
+        assert(self.index.search(u"BAKKER", limit=2) == [1, 0])
+        assert(self.index.search(u"bakkerij") == [0, 3])
+
+    def test_prefix(self):
+        assert(self.index.search(u"bak", prefix=True) == [1, 0])
+        assert(self.index.search(u"b", prefix=True) == [1, 0])
+        assert(self.index.search(u"hoek", prefix=True) == [5])
+
+    def test_substring(self):
+        assert(self.index.search(u"hoek") == [5, 4])
+        assert(self.index.search(u"cafe") == [4])
+        assert(self.index.search(u"a", limit=None) == [6, 1, 2, 3, 4, 5, 0])
+        assert(self.index.search(u"xyz") == [])
+        assert(self.index.search(u"") == [])
+        assert(len(self.index) == 8)
+
+    def test_concurrent_search(self):
+        index = NameIndex()
+        errors = []
+
+        def search():
+            try:
+                for i in range(200):
+                    results = index.search(u"bakkerij", limit=None)
+                    assert(len(results) == len(set(results)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=search) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(2000):
+            index.add(u"Bakkerij {0}".format(i), i)
+        for thread in threads:
+            thread.join()
+        assert(errors == [])
+        assert(sorted(index.search(u"bakkerij", limit=None)) == list(range(2000)))
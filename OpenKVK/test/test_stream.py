@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+import pytest
+
+from OpenKVK import ApiClient
+from OpenKVK.Client import _py_loads
+from OpenKVK.stream import iter_result
+
+
+HEADER = ["kvk", "bedrijfsnaam", "plaats"]
+ROWS = [[270000000000 + i, u"Café {0}, \"de Zon\" [B.V.]".format(i), "Utrecht"] for i in range(150)]
+
+
+def response(rows=ROWS, header=HEADER):
+    return json.dumps([{"RESULT": {"TYPES": ["bigint", "varchar", "varchar"], "HEADER": header, "ROWS": rows}}],
+                      ensure_ascii=False)
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class FakePool(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+        self.read = 0
+
+    def stream(self, url):
+        self.urls.append(url)
+        return self.chunks(self.responses.pop(0))
+
+    def chunks(self, text):
+        for chunk in chunked(text, 7):
+            self.read += 1
+            yield chunk
+
+
+class TestIterResult(unittest.TestCase):
+    def test_decodes_any_chunking(self):
+        for size in (1, 3, 64, 100000):
+            result, rows = iter_result(chunked(response(), size))
+            assert(result['HEADER'] == HEADER and result['TYPES'] == ["bigint", "varchar", "varchar"])
+            assert(list(rows) == ROWS)
+
+    def test_rows_before_download_finishes(self):
+        chunks = iter(chunked(response(), 16))
+        result, rows = iter_result(chunks)
+        assert(next(rows) == ROWS[0])
+        assert(len(list(chunks)) > 0)
+
+    def test_empty_rows(self):
+        result, rows = iter_result(chunked(response(rows=[]), 5))
+        assert(list(rows) == [])
+
+    def test_python_literal_fallback(self):
+        text = str([{'RESULT': {'HEADER': ['kvk', 'status'], 'ROWS': [[1, None], [2, 'x']]}}])
+        result, rows = iter_result(chunked(text, 4), _py_loads)
+        assert(list(rows) == [[1, None], [2, 'x']])
+        text = '[{"RESULT": {"HEADER": ["kvk", "status"], "ROWS": [[1, None]]}}]'
+        result, rows = iter_result(chunked(text, 4), _py_loads)
+        assert(list(rows) == [[1, None]])
+        # literals after the first row are decoded per row
+        text = '[{"RESULT": {"HEADER": ["kvk", "status"], "ROWS": [[1, "a"], [2, None], [3, \'b]\\\'\'], [4, True]]}}]'
+        for size in (1, 4, len(text)):
+            result, rows = iter_result(chunked(text, size), _py_loads)
+            assert(list(rows) == [[1, "a"], [2, None], [3, "b]'"], [4, True]])
+
+    def test_header_after_rows(self):
+        text = '[{"RESULT": {"ROWS": [[1], [2]], "HEADER": ["kvk"]}}]'
+        result, rows = iter_result(chunked(text, 3))
+        assert(result['HEADER'] == ["kvk"] and list(rows) == [[1], [2]])
+
+    def test_truncated_response(self):
+        result, rows = iter_result(chunked(response()[:-200], 50))
+        with pytest.raises(ValueError):
+            list(rows)
+
+
+class TestStreamingClient(unittest.TestCase):
+    def setUp(self):
+        self.client = ApiClient(response_format='json', streaming=True)
+
+    def test_iter_query_streams_pages(self):
+        self.client.CONNECTION_POOL = FakePool([response(ROWS[:99]), response(ROWS[99:])])
+        results = list(self.client.iter_by_city("utrecht", limit=None))
+        assert(len(results) == 150 and results[0]['bedrijfsnaam'] == ROWS[0][1])
+        assert(len(self.client.CONNECTION_POOL.urls) == 2)
+        assert("OFFSET%2099" in self.client.CONNECTION_POOL.urls[1])
+
+    def test_compact_rows(self):
+        self.client.setCompact(True)
+        self.client.CONNECTION_POOL = FakePool([response(ROWS[:10])])
+        results = list(self.client.iter_by_city("utrecht"))
+        assert(results[3]['kvk'] == ROWS[3][0] and tuple(results[3]) == tuple(ROWS[3]))
+
+    def test_stops_reading_when_abandoned(self):
+        self.client.CONNECTION_POOL = FakePool([response(ROWS[:99])])
+        rows = self.client.iter_by_city("utrecht")
+        next(rows)
+        rows.close()
+        assert(self.client.CONNECTION_POOL.read < len(chunked(response(ROWS[:99]), 7)))
+
+    def test_streaming_needs_no_cache(self):
+        self.client.setCoalescing(True)
+        assert(not self.client._streams())
+        self.client.setCoalescing(False)
+        self.client.setResponseFormat('csv')
+        assert(not self.client._streams())
+        self.client.setResponseFormat('py')
+        assert(self.client._streams())
+
+    def test_set_streaming(self):
+        with pytest.raises(TypeError):
+            self.client.setStreaming("yes")
+        self.client.setStreaming(False)
+        assert(not self.client._streams())
@@ -0,0 +1,152 @@
+import gzip
+import os
+import threading
+import unittest
+import zlib
+
+import pytest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.error import HTTPError
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from urllib2 import HTTPError
+
+from OpenKVK import BaseClient
+from OpenKVK.transport import ConnectionPool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    authorization = None
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        Handler.authorization = self.headers.get('Proxy-Authorization')
+        if self.path.endswith('redirect'):
+            self.send_response(302)
+            self.send_header('Location', '/a')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        status = 404 if self.path.endswith('missing') else 200
+        body = self.path.encode('utf-8')
+        encoding = None
+        if '/compressed' in self.path and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body, encoding = gzip.compress(body * 1000), 'gzip'
+        elif '/deflate' in self.path:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+            body, encoding = compressor.compress(body * 1000) + compressor.flush(), 'deflate'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        Handler.connections = set()
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{0}/'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool()
+        timings = {}
+        assert(pool.urlopen(self.url + 'a', timings=timings) == b'/a')
+        assert(timings['reused'] is False and timings['bytes'] == 2)
+        assert(pool.urlopen(self.url + 'b', timings=timings) == b'/b')
+        assert(timings['reused'] is True and timings['wait'] >= 0)
+        assert(len(Handler.connections) == 1)
+        pool.clear()
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(idle_timeout=0)
+        pool.urlopen(self.url + 'a')
+        pool.urlopen(self.url + 'b')
+        assert(len(Handler.connections) == 2)
+
+    def test_http_error(self):
+        pool = ConnectionPool()
+        with pytest.raises(HTTPError):
+            pool.urlopen(self.url + 'missing')
+        assert(pool.urlopen(self.url + 'a') == b'/a')
+        assert(len(Handler.connections) == 1)
+        pool.clear()
+
+    def test_compressed_responses(self):
+        pool = ConnectionPool()
+        timings = {}
+        assert(pool.urlopen(self.url + 'compressed', timings=timings) == b'/compressed' * 1000)
+        assert(timings['bytes'] == 11000 and timings['wire_bytes'] < 1000)
+        assert(pool.urlopen(self.url + 'deflate') == b'/deflate' * 1000)
+        assert(pool.stats()['bytes'] == 19000 and pool.stats()['wire_bytes'] < 2000)
+        pool.clear()
+
+    def test_uncompressed_responses(self):
+        pool = ConnectionPool(compress=False)
+        assert(pool.urlopen(self.url + 'compressed') == b'/compressed')
+        assert(pool.stats() == {'wire_bytes': 11, 'bytes': 11})
+        pool.clear()
+
+    def test_stream(self):
+        pool = ConnectionPool()
+        assert(b''.join(pool.stream(self.url + 'compressed')) == b'/compressed' * 1000)
+        assert(b''.join(pool.stream(self.url + 'a')) == b'/a')
+        assert(len(Handler.connections) == 1)
+        with pytest.raises(HTTPError):
+            pool.stream(self.url + 'missing')
+        chunks = pool.stream(self.url + 'deflate')
+        next(chunks)
+        chunks.close()
+        assert(pool.urlopen(self.url + 'b') == b'/b')
+        assert(len(Handler.connections) == 2)
+        pool.clear()
+
+    def test_redirect(self):
+        pool = ConnectionPool()
+        assert(pool.urlopen(self.url + 'redirect') == b'/a')
+        assert(len(Handler.connections) == 1)
+        pool.clear()
+
+    def test_proxy(self):
+        environ = dict(os.environ)
+        for name in ('no_proxy', 'NO_PROXY', 'HTTP_PROXY'):
+            os.environ.pop(name, None)
+        pool = ConnectionPool()
+        try:
+            os.environ['http_proxy'] = self.url.replace('//', '//user:secret@')
+            assert(pool.urlopen('http://api.openkvk.invalid/py/SELECT%201') == b'http://api.openkvk.invalid/py/SELECT%201')
+            assert(Handler.authorization == 'Basic dXNlcjpzZWNyZXQ=')
+            pool.clear()
+
+            os.environ['http_proxy'] = 'http://127.0.0.1:1'
+            os.environ['no_proxy'] = '127.0.0.1'
+            assert(pool.urlopen(self.url + 'a') == b'/a')
+        finally:
+            pool.clear()
+            os.environ.clear()
+            os.environ.update(environ)
+
+    def test_client_uses_shared_pool(self):
+        client = BaseClient()
+        client.BASE_URL = self.url
+        client.query("SELECT 1")
+        other = BaseClient()
+        other.BASE_URL = self.url
+        assert(other.query("SELECT 2") == '/py/SELECT%202')
+        assert(len(Handler.connections) == 1)
+        BaseClient.CONNECTION_POOL.clear()
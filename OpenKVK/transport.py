@@ -0,0 +1,363 @@
+import base64
+import socket
+import threading
+import time
+import zlib
+
+try:
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib.parse import unquote, urljoin, urlsplit
+    from urllib.error import HTTPError
+    from urllib.request import getproxies, proxy_bypass
+except ImportError:
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib import getproxies, proxy_bypass, unquote
+    from urlparse import urljoin, urlsplit
+    from urllib2 import HTTPError
+
+
+def _proxy(scheme,host):
+    """Returns the proxy for requests to *host* from the environment (``http_proxy``, ``https_proxy`` and
+    ``no_proxy``), None for a direct connection
+
+    :returns: Tuple of the proxy host, port and ``Proxy-Authorization`` header (None without credentials)
+    :rtype: tuple
+    """
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(host):
+        return None
+    if '://' not in proxy:
+        proxy = 'http://' + proxy
+    parts = urlsplit(proxy)
+    authorization = None
+    if parts.username is not None:
+        credentials = '{0}:{1}'.format(unquote(parts.username), unquote(parts.password or ''))
+        authorization = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+    return parts.hostname, parts.port or 80, authorization
+
+
+class ConnectionPool(object):
+    """
+    Thread safe pool of persistent (keep-alive) HTTP connections.
+    Connections are kept per host and reused across requests, idle connections are closed after *idle_timeout* seconds
+
+    Compressed (gzip or deflate) responses are requested and decompressed while reading, :meth:`stats` reports the
+    number of bytes transferred and the number of bytes after decompression
+
+    Like :func:`urllib.request.urlopen`, the proxies of the environment (``http_proxy``, ``https_proxy`` and
+    ``no_proxy``) are used and redirects are followed
+
+    :param int maxsize: Maximum number of idle connections kept per host
+    :param float idle_timeout: Seconds an idle connection may be reused
+    :param float timeout: Socket timeout in seconds for new connections
+    :param bool compress: Request compressed responses
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    REDIRECTS = (301, 302, 303, 307, 308)
+    MAX_REDIRECTS = 10
+
+    def __init__(self,maxsize=10,idle_timeout=30,timeout=None,compress=True):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+        self.wire_bytes = 0
+        self.bytes = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Returns the number of bytes transferred (``wire_bytes``) and decompressed (``bytes``) by this pool
+
+        :rtype: dict
+        """
+        return {'wire_bytes': self.wire_bytes, 'bytes': self.bytes}
+
+    def _read(self,response):
+        """Reads the body of *response*, decompressing it chunk by chunk while reading
+
+        :returns: Tuple of the decompressed body and the number of bytes transferred
+        :rtype: tuple
+        """
+        if not self._compressed(response):
+            body = response.read()
+            return body, len(body)
+        chunks = []
+        wire_bytes = 0
+        for chunk, transferred in self._chunks(response):
+            chunks.append(chunk)
+            wire_bytes += transferred
+        return b''.join(chunks), wire_bytes
+
+    def _compressed(self,response):
+        return (response.getheader('Content-Encoding') or '').strip().lower() in ('gzip', 'x-gzip', 'deflate')
+
+    def _chunks(self,response):
+        """Yields the body of *response* in decompressed chunks, together with the number of bytes transferred for each"""
+        if not self._compressed(response):
+            while True:
+                chunk = response.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk, len(chunk)
+
+        # gzip and zlib wrapped deflate are detected from their header, raw deflate is tried when that fails
+        encoding = response.getheader('Content-Encoding').strip().lower()
+        decoder = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        wire_bytes = 0
+        while True:
+            chunk = response.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            try:
+                data = decoder.decompress(chunk)
+            except zlib.error:
+                if wire_bytes or encoding != 'deflate':
+                    raise
+                decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+                data = decoder.decompress(chunk)
+            wire_bytes += len(chunk)
+            yield data, len(chunk)
+        yield decoder.flush(), 0
+
+    def _connect(self,key):
+        scheme, host, port, proxy = key
+        connection_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        if proxy is not None:
+            # https is tunneled through the proxy with CONNECT, http requests are sent to the proxy
+            host, port = proxy[0], proxy[1]
+        if self.timeout is None:
+            connection = connection_class(host, port)
+        else:
+            connection = connection_class(host, port, timeout=self.timeout)
+        if proxy is not None and scheme == 'https':
+            connection.set_tunnel(key[1], key[2], {'Proxy-Authorization': proxy[2]} if proxy[2] else None)
+        return connection
+
+    def _acquire(self,key):
+        """Returns an idle connection for *key* or a new one, together with a flag telling if it was reused"""
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                connection, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    return connection, True
+                connection.close()
+        return self._connect(key), False
+
+    def _release(self,key,connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append((connection, time.time()))
+                return
+        connection.close()
+
+    def clear(self):
+        """Closes all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection, last_used in connections:
+                connection.close()
+
+    def _begin(self,url,headers):
+        """Sends a GET request for *url* on a pooled connection and waits for the response headers, following redirects
+
+        :returns: Tuple of the pool key, connection, response, reuse flag, connect and wait seconds
+        :rtype: tuple
+        """
+        headers = dict(headers or {})
+        if self.compress:
+            headers.setdefault('Accept-Encoding', 'gzip, deflate')
+
+        connect = wait = 0.0
+        for redirect in range(self.MAX_REDIRECTS + 1):
+            key, connection, response, reused, connected, waited = self._send(url, headers)
+            connect += connected
+            wait += waited
+            location = response.getheader('Location')
+            if response.status not in self.REDIRECTS or not location:
+                return key, connection, response, reused, connect, wait
+            try:
+                response.read()
+            except (socket.error, HTTPException):
+                connection.close()
+            else:
+                self._finish(key, connection, response)
+            url = urljoin(url, location)
+        raise HTTPError(url, response.status, 'Too many redirects', response.msg, None)
+
+    def _send(self,url,headers):
+        """Sends a single GET request for *url*, directly or through the proxy of the environment
+
+        :returns: Tuple of the pool key, connection, response, reuse flag, connect and wait seconds
+        :rtype: tuple
+        """
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        proxy = _proxy(parts.scheme, parts.hostname)
+        key = (parts.scheme, parts.hostname, port, proxy)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        if proxy is not None and parts.scheme != 'https':
+            # requests to a proxy carry the absolute url
+            path = '{0}://{1}{2}'.format(parts.scheme, parts.netloc, path)
+            if proxy[2]:
+                headers = dict(headers, **{'Proxy-Authorization': proxy[2]})
+
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                start = time.time()
+                if not reused:
+                    connection.connect()
+                connected = time.time()
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            except (socket.error, HTTPException):
+                connection.close()
+                if reused:
+                    # the server closed the kept-alive connection, retry on a new one
+                    continue
+                raise
+            return key, connection, response, reused, connected - start, time.time() - connected
+
+    def _finish(self,key,connection,response):
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+
+    def urlopen(self,url,headers=None,timings=None):
+        """Performs a GET request on a pooled connection and returns the response body
+
+        :param string url: Url to request
+        :param dict headers: Additional request headers
+        :param dict timings: Optional dictionary that is filled with ``reused``, ``connect``, ``wait``, ``download``
+                             (seconds), ``bytes`` (decompressed) and ``wire_bytes`` (transferred)
+        :returns: Response body
+        :rtype: bytes
+        """
+        key, connection, response, reused, connect, wait = self._begin(url, headers)
+        received = time.time()
+        try:
+            body, wire_bytes = self._read(response)
+        except (socket.error, HTTPException):
+            connection.close()
+            raise
+
+        with self._lock:
+            self.wire_bytes += wire_bytes
+            self.bytes += len(body)
+        if timings is not None:
+            timings.update(reused=reused, connect=connect, wait=wait,
+                           download=time.time() - received, bytes=len(body), wire_bytes=wire_bytes)
+
+        self._finish(key, connection, response)
+        if response.status != 200:
+            raise HTTPError(url, response.status, response.reason, response.msg, None)
+        return body
+
+    def stream(self,url,headers=None):
+        """Performs a GET request on a pooled connection and returns the response body as an iterator of decompressed
+        chunks, so it can be processed while it is downloading.
+        The request is sent and the status checked before this method returns, the body is read while iterating.
+        The connection goes back to the pool once the body is exhausted and is closed when iteration stops early
+
+        :param string url: Url to request
+        :param dict headers: Additional request headers
+        :returns: Iterator of response body chunks
+        :rtype: iterator
+        """
+        key, connection, response, reused, connect, wait = self._begin(url, headers)
+        if response.status != 200:
+            try:
+                self._read(response)
+            except (socket.error, HTTPException):
+                connection.close()
+            else:
+                self._finish(key, connection, response)
+            raise HTTPError(url, response.status, response.reason, response.msg, None)
+        return self._stream(key, connection, response)
+
+    def _stream(self,key,connection,response):
+        finished = False
+        try:
+            for chunk, wire_bytes in self._chunks(response):
+                with self._lock:
+                    self.wire_bytes += wire_bytes
+                    self.bytes += len(chunk)
+                if chunk:
+                    yield chunk
+            finished = True
+        finally:
+            if finished:
+                self._finish(key, connection, response)
+            else:
+                connection.close()
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces identical concurrent calls: while a call for a key is running, other callers with the same key wait for
+    it and receive the same result (or exception) instead of performing the call themselves.
+    Nothing is kept once the call has finished
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def do(self,key,func):
+        """Calls *func* unless a call for *key* is already running, in which case its result is awaited
+
+        :param string key: Key identifying identical calls
+        :param callable func: Function to call
+        :returns: Tuple of the result and a flag telling if the result was shared from another caller
+        :rtype: tuple
+        """
+        with self._lock:
+            call = self._running.get(key)
+            shared = call is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                call = self._running[key] = _Call()
+                self.calls += 1
+
+        if shared:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._running[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        """Returns the number of performed and coalesced calls
+
+        :rtype: dict
+        """
+        return {'calls': self.calls, 'coalesced': self.coalesced}
@@ -0,0 +1,37 @@
+"""Parse throughput of the ``py`` response format, in rows per second
+
+Usage::
+
+    python benchmarks/bench_parse.py
+"""
+from __future__ import print_function
+import ast
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from OpenKVK import QueryBuilder
+from fixtures import page as fixture_page
+
+
+def literal_eval_parse(response_buffer):
+    """The previous parser, kept as a baseline"""
+    return [ast.literal_eval(response.replace('null', 'None')) for response in response_buffer]
+
+
+def main():
+    client = QueryBuilder(response_format='py')
+    print("{0:>6} {1:>16} {2:>16}".format("pages", "literal_eval", "_parse_query"))
+    for pages in (1, 10, 100):
+        response_buffer = [fixture_page('py', i * 99) for i in range(pages)]
+        rows = pages * 99
+        number = max(1, 100 // pages)
+        baseline = timeit.timeit(lambda: literal_eval_parse(response_buffer), number=number) / number
+        current = timeit.timeit(lambda: client._parse_query_results(response_buffer), number=number) / number
+        print("{0:>6} {1:>11.0f} r/s {2:>11.0f} r/s".format(pages, rows / baseline, rows / current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Generated service responses at realistic sizes, used by the benchmarks"""
+import csv
+import io
+import json
+
+COLUMNS = [("kvk", "bigint"), ("bedrijfsnaam", "varchar"), ("kvks", "int"), ("sub", "int"), ("adres", "varchar"),
+           ("postcode", "varchar"), ("plaats", "varchar"), ("type", "varchar"), ("status", "varchar"),
+           ("website", "varchar"), ("vestiging", "int"), ("rechtsvorm", "varchar"), ("lat_rad", "double"),
+           ("lon_rad", "double"), ("anbi", "varchar")]
+
+
+def row(i, width=len(COLUMNS)):
+    values = [270000000000 + i, "Bedrijf {0}, Holding B.V.".format(i), 27000000 + i, 0, "Straat {0}".format(i),
+              "3511AB", "Utrecht", "Hoofdvestiging", None, "www.bedrijf{0}.nl".format(i), i,
+              "Besloten Vennootschap", 0.9094 + i * 1e-7, 0.0889 + i * 1e-7, None]
+    return (values * (width // len(values) + 1))[:width]
+
+
+def header(width=len(COLUMNS)):
+    names = [name for name, kind in COLUMNS]
+    return [names[i % len(names)] + ("" if i < len(names) else str(i // len(names))) for i in range(width)]
+
+
+def types(width=len(COLUMNS)):
+    return [COLUMNS[i % len(COLUMNS)][1] for i in range(width)]
+
+
+def page(response_format, offset, rows=99, width=len(COLUMNS)):
+    """Returns a raw service response in *response_format* containing *rows* companies starting at *offset*"""
+    data = [row(i, width) for i in range(offset, offset + rows)]
+    if response_format == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        writer.writerow(header(width))
+        writer.writerows(["" if value is None else value for value in values] for values in data)
+        return output.getvalue()
+    return json.dumps([{"RESULT": {"TYPES": types(width), "HEADER": header(width), "ROWS": data}}])
+
+
+def pages(response_format, count, rows=99, width=len(COLUMNS)):
+    """Returns *count* consecutive pages"""
+    return [page(response_format, i * rows, rows, width) for i in range(count)]
@@ -0,0 +1,122 @@
+"""Offline micro-benchmarks for query building and result parsing
+
+Reports throughput and peak memory per benchmark. Save a baseline and compare later runs against it::
+
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json --tolerance 0.25
+
+The comparison exits with status 1 when a benchmark is slower than the baseline by more than the tolerance.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from OpenKVK import QueryBuilder
+import fixtures
+
+
+def parse_benchmark(response_format, count, width=len(fixtures.COLUMNS), compact=False, columnar=False, processes=1):
+    client = QueryBuilder(response_format=response_format, compact=compact, columnar=columnar, processes=processes)
+    response_buffer = fixtures.pages(response_format, count, width=width)
+    return lambda: client._parse_query_results(response_buffer), count * 99
+
+
+def pythonify_benchmark(count):
+    client = QueryBuilder()
+    result = {'RESULT': {'HEADER': fixtures.header(), 'ROWS': [fixtures.row(i) for i in range(count * 99)]}}
+    return lambda: client._pythonify_result(result), count * 99
+
+
+def divider_benchmark(count):
+    client = QueryBuilder()
+    return lambda: client._query_divider("SELECT * FROM kvk WHERE plaats ILIKE '%utrecht%'", count * 99), count
+
+
+def urlencode_benchmark(count):
+    client = QueryBuilder()
+    queries = client._query_divider("SELECT * FROM kvk WHERE plaats ILIKE '%utrecht%' AND isnull(status)", count * 99)
+    return lambda: [client._urlencode_query(query) for query in queries], count
+
+
+def do_query_benchmark(response_format, count):
+    client = QueryBuilder(response_format=response_format, onlyActiveCompanies=False)
+    responses = dict((i * 99, page) for i, page in enumerate(fixtures.pages(response_format, count)))
+    client.request = lambda query: responses[int(query.rstrip(';').rsplit(' ', 1)[1])]
+    return lambda: client.do_query("SELECT * FROM kvk", count * 99), count * 99
+
+
+def benchmarks():
+    for response_format in ('json', 'py', 'csv'):
+        for count in (1, 10, 100):
+            yield "parse_{0}_{1}p".format(response_format, count), parse_benchmark(response_format, count)
+    yield "parse_py_100p_compact", parse_benchmark('py', 100, compact=True)
+    yield "parse_py_100p_columnar", parse_benchmark('py', 100, columnar=True)
+    yield "parse_py_100p_4proc", parse_benchmark('py', 100, processes=4)
+    yield "parse_json_100p_4proc", parse_benchmark('json', 100, processes=4)
+    yield "parse_py_100p_columnar_4proc", parse_benchmark('py', 100, columnar=True, processes=4)
+    yield "parse_py_10p_wide", parse_benchmark('py', 10, width=60)
+    yield "pythonify_100p", pythonify_benchmark(100)
+    yield "query_divider_500p", divider_benchmark(500)
+    yield "urlencode_500p", urlencode_benchmark(500)
+    yield "do_query_py_100p", do_query_benchmark('py', 100)
+    yield "do_query_csv_100p", do_query_benchmark('csv', 100)
+
+
+def measure(func, units, repeat=3):
+    number = 1
+    while timeit.timeit(func, number=number) < 0.2:
+        number *= 2
+    seconds = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': seconds, 'throughput': units / seconds, 'peak_bytes': peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--save', help="save the results as baseline to this file")
+    parser.add_argument('--compare', help="compare the results with this baseline file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument('--filter', default='', help="only run benchmarks containing this string")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print("{0:<30} {1:>14} {2:>12} {3:>10}".format("benchmark", "units/sec", "peak KiB", "vs base"))
+    for name, (func, units) in benchmarks():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(func, units)
+        change = ""
+        if name in baseline:
+            ratio = result['throughput'] / baseline[name]['throughput']
+            change = "{0:+.0%}".format(ratio - 1)
+            if ratio < 1 - args.tolerance:
+                regressions.append(name)
+        print("{0:<30} {1:>14,.0f} {2:>12,.0f} {3:>10}".format(name, result['throughput'], result['peak_bytes'] / 1024.0, change))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
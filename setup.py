@@ -62,6 +62,7 @@ setup(
         'Topic :: Office/Business'
         ],
     extras_require={
-        'testing': ['pytest']},
+        'testing': ['pytest'],
+        'pandas': ['pandas']},
     entry_points = {'console_scripts': ['openkvk = OpenKVK.cli:main']},
 )